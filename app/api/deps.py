@@ -0,0 +1,89 @@
+"""Dependencias compartidas de FastAPI.
+
+Los servicios se crean la primera vez que un endpoint los pide y se reutilizan
+durante toda la vida del proceso (en Lambda, entre invocaciones del mismo
+contenedor), de modo que la sesión HTTP hacia Supabase y sus conexiones
+keep-alive no se reconstruyen en cada petición.
+
+Los módulos de servicios (pandas, scikit-learn, supabase) se importan dentro
+de cada función: así el arranque en frío de `/health` o `/email/send` no paga
+por librerías que nunca usa.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from app.services.ai_service import PredictorReservas
+    from app.services.restaurant_insights_service import RestaurantAIInsightsService
+    from app.services.supabase_service import AsyncSupabaseService, SupabaseService
+    from app.services.training_jobs import TrainingJobManager
+
+_lock = threading.Lock()
+_async_lock = asyncio.Lock()
+_supabase_service: Optional[SupabaseService] = None
+_async_supabase_service: Optional[AsyncSupabaseService] = None
+_insights_service: Optional[RestaurantAIInsightsService] = None
+_predictor: Optional[PredictorReservas] = None
+_training_jobs: Optional[TrainingJobManager] = None
+
+
+def get_supabase_service() -> SupabaseService:
+    global _supabase_service
+    if _supabase_service is None:
+        from app.services.supabase_service import SupabaseService
+
+        with _lock:
+            if _supabase_service is None:
+                _supabase_service = SupabaseService()
+    return _supabase_service
+
+
+async def get_async_supabase_service() -> AsyncSupabaseService:
+    """Cliente asíncrono de Supabase para los handlers `async def`."""
+    global _async_supabase_service
+    if _async_supabase_service is None:
+        from app.services.supabase_service import AsyncSupabaseService
+
+        async with _async_lock:
+            if _async_supabase_service is None:
+                _async_supabase_service = await AsyncSupabaseService.create()
+    return _async_supabase_service
+
+
+async def get_insights_service() -> RestaurantAIInsightsService:
+    global _insights_service
+    if _insights_service is None:
+        from app.services.restaurant_insights_service import RestaurantAIInsightsService
+
+        async_supabase = await get_async_supabase_service()
+        supabase_service = get_supabase_service()
+        with _lock:
+            if _insights_service is None:
+                _insights_service = RestaurantAIInsightsService(supabase_service, async_supabase)
+    return _insights_service
+
+
+def get_predictor() -> PredictorReservas:
+    global _predictor
+    if _predictor is None:
+        from app.services.ai_service import PredictorReservas
+
+        with _lock:
+            if _predictor is None:
+                _predictor = PredictorReservas()
+    return _predictor
+
+
+def get_training_jobs() -> TrainingJobManager:
+    global _training_jobs
+    if _training_jobs is None:
+        from app.services.training_jobs import TrainingJobManager
+
+        with _lock:
+            if _training_jobs is None:
+                _training_jobs = TrainingJobManager()
+    return _training_jobs
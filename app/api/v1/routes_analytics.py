@@ -1,16 +1,18 @@
 # app/api/v1/routes_analytics.py
-from fastapi import APIRouter
-from app.services.supabase_service import SupabaseService
+from fastapi import APIRouter, Depends, Query
+from app.api.deps import get_supabase_service
 
 router = APIRouter(prefix="/analisis", tags=["Analisis"])
-supabase_service = SupabaseService()
 
 @router.get("/restaurante-mas-reservado")
-def most_booked_restaurant():
-    """Devuelve el restaurante con más reservaciones"""
-    return supabase_service.get_most_booked_restaurant()
+def most_booked_restaurant(
+    top_n: int = Query(1, ge=1, le=50, description="Cantidad de restaurantes en el ranking"),
+    supabase_service=Depends(get_supabase_service),
+):
+    """Devuelve el restaurante con más reservaciones y el ranking de los `top_n` más reservados"""
+    return supabase_service.get_most_booked_restaurant(top_n)
 
 @router.get("/resumen")
-def summary():
+def summary(supabase_service=Depends(get_supabase_service)):
     """Estadísticas generales de las reservaciones"""
     return supabase_service.get_summary()
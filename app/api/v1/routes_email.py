@@ -1,7 +1,9 @@
+import time
+
 from fastapi import APIRouter, HTTPException, status
 
-from app.models.email import EmailRequest
-from app.services.email_sender import EmailServiceError, send_email_via_api
+from app.models.email import EmailBatchRequest, EmailRequest
+from app.services.email_sender import EmailServiceError, send_email_via_api, send_emails_concurrently
 
 router = APIRouter()
 
@@ -13,3 +15,18 @@ async def send_email(payload: EmailRequest):
     except EmailServiceError as exc:
         http_status = exc.status_code or status.HTTP_502_BAD_GATEWAY
         raise HTTPException(status_code=http_status, detail=str(exc)) from exc
+
+
+@router.post("/email/send-batch", tags=["email"])
+async def send_email_batch(payload: EmailBatchRequest):
+    """Send up to 1,000 emails in one request; returns per-item results and aggregate timing."""
+    started = time.perf_counter()
+    results = await send_emails_concurrently(payload.emails)
+    sent = sum(1 for result in results if result["status"] == "sent")
+    return {
+        "total": len(results),
+        "sent": sent,
+        "failed": len(results) - sent,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "results": results,
+    }
@@ -1,31 +1,57 @@
-from fastapi import APIRouter, Query
-import pandas as pd
-from app.services.supabase_service import SupabaseService
-from app.services.ai_service import InteligenciaReservas
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from app.api.deps import get_predictor, get_supabase_service, get_training_jobs
+from app.core.cache import TTLCache
+from app.models.predict import PrediccionLoteIn
+
+# pandas y scikit-learn (vía ai_service) se importan dentro de cada endpoint
+# para no cargarlos en el arranque en frío de rutas que no los usan.
 
 router = APIRouter(prefix="/ia", tags=["Inteligencia Artificial"])
-supabase = SupabaseService()
+
+# Recomendaciones por (top_n, marca de agua de reservations): se recalculan solo si cambian los datos
+recomendaciones_cache = TTLCache(maxsize=32, ttl=600)
 
 # ==========================
 # 🔹 ENTRENAR MODELO
 # ==========================
-@router.post("/entrenar")
-def entrenar_modelo():
+@router.post("/entrenar", status_code=202)
+def entrenar_modelo(
+    response: Response,
+    modo: str = Query(
+        "completo",
+        pattern="^(incremental|completo)$",
+        description="`completo`: todo el historial; `incremental`: solo reservaciones nuevas desde el último entrenamiento",
+    ),
+    jobs=Depends(get_training_jobs),
+):
     """
-    Entrena el modelo de inteligencia artificial con las reservaciones actuales.
+    Inicia el entrenamiento del modelo y retorna el trabajo creado.
+    En segundo plano responde `202` y el estado se consulta en `GET /ia/entrenar/{job_id}`;
+    en AWS Lambda entrena dentro de la petición y responde `200` con el trabajo terminado.
+    Si ya hay un entrenamiento en curso se retorna ese mismo trabajo.
     """
-    print("Iniciando entrenamiento del modelo de IA...")
-    try:
-        df_reservas = supabase.get_reservations_df()
-        df_restaurantes = supabase.client.table("restaurants").select("id, name").execute().data
+    job, nuevo = jobs.iniciar(modo)
+    print(f"Entrenamiento del modelo de IA {'iniciado' if nuevo else 'ya en curso'}: {job['job_id']} ({job['modo']})")
+    if job["estado"] != "en_curso":
+        response.status_code = 200
+    if not nuevo:
+        mensaje = "Ya hay un entrenamiento en curso; se reutiliza ese trabajo"
+    elif job["estado"] == "en_curso":
+        mensaje = "Entrenamiento iniciado"
+    else:
+        mensaje = "Entrenamiento terminado"
+    return {**job, "mensaje": mensaje}
 
-        df_restaurantes = None if not df_restaurantes else \
-            supabase.client.table("restaurants").select("id, name").execute().data
 
-        ai = InteligenciaReservas(pd.DataFrame(df_reservas), pd.DataFrame(df_restaurantes))
-        return ai.entrenar_modelo()
-    except Exception as e:
-        return {"error": f"Ocurrió un error al entrenar el modelo: {str(e)}"}
+@router.get("/entrenar/{job_id}")
+def estado_entrenamiento(job_id: str, jobs=Depends(get_training_jobs)):
+    """
+    Estado de un entrenamiento: `en_curso`, `completado` (con las métricas en `resultado`) o `fallido`.
+    """
+    job = jobs.obtener(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo de entrenamiento no encontrado")
+    return job
 
 
 # ==========================
@@ -36,36 +62,66 @@ def predecir_estado(
     restaurant_id: str,
     invitados: int,
     hora: int = Query(..., ge=0, le=23, description="Hora de la reservación (0-23)"),
-    dia_semana: int = Query(..., ge=0, le=6, description="Día de la semana (0=Lunes, 6=Domingo)")
+    dia_semana: int = Query(..., ge=0, le=6, description="Día de la semana (0=Lunes, 6=Domingo)"),
+    predictor=Depends(get_predictor),
 ):
     """
     Predice si una reservación será confirmada, cancelada o completada.
     """
     try:
-        df_reservas = supabase.get_reservations_df()
-        ai = InteligenciaReservas(pd.DataFrame(df_reservas))
-        return ai.predecir_estado(restaurant_id, invitados, hora, dia_semana)
+        return predictor.predecir_estado(restaurant_id, invitados, hora, dia_semana)
     except Exception as e:
         return {"error": f"Ocurrió un error al predecir: {str(e)}"}
 
 
+# ==========================
+# 🔹 PREDECIR ESTADO EN LOTE
+# ==========================
+@router.post("/predecir/lote")
+def predecir_lote(payload: PrediccionLoteIn, predictor=Depends(get_predictor)):
+    """
+    Predice el estado de muchas reservaciones en una sola llamada al modelo.
+    """
+    try:
+        reservas = payload.reservas
+        return predictor.predecir_lote(
+            [r.restaurant_id for r in reservas],
+            [r.invitados for r in reservas],
+            [r.hora for r in reservas],
+            [r.dia_semana for r in reservas],
+        )
+    except Exception as e:
+        return {"error": f"Ocurrió un error al predecir el lote: {str(e)}"}
+
+
 # ==========================
 # 🔹 RECOMENDAR RESTAURANTE Y HORARIO
 # ==========================
 @router.get("/recomendar")
-def recomendar(top_n: int = 3):
+def recomendar(top_n: int = 3, supabase=Depends(get_supabase_service)):
     """
     Genera recomendaciones de restaurantes y horarios más populares
     según las reservaciones confirmadas o completadas.
     """
+    import pandas as pd
+    from app.services.ai_service import InteligenciaReservas
+
     try:
-        df_reservas = supabase.get_reservations_df()
+        cache_key = (top_n, supabase.get_reservations_watermark())
+        cached = recomendaciones_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        df_reservas = supabase.get_reservations_df(columns=InteligenciaReservas.COLUMNAS_REQUERIDAS)
         df_restaurantes = supabase.client.table("restaurants").select("id, name").execute().data
 
         df_reservas = pd.DataFrame(df_reservas)
         df_restaurantes = pd.DataFrame(df_restaurantes) if df_restaurantes else None
 
         ai = InteligenciaReservas(df_reservas, df_restaurantes)
-        return ai.recomendar(top_n)
+        resultado = ai.recomendar(top_n)
+        if "error" not in resultado:
+            recomendaciones_cache.set(cache_key, resultado)
+        return resultado
     except Exception as e:
         return {"error": f"Ocurrió un error al generar recomendaciones: {str(e)}"}
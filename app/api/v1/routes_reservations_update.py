@@ -1,14 +1,14 @@
 # app/api/v1/routes_reservations_update.py
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Body
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel, Field, validator
-from app.services.supabase_service import SupabaseService
-from app.services.email_sender import send_email_via_api
+from app.api.deps import get_async_supabase_service
+from app.services.email_templates import SafeHTML, render_email, render_fragment
+from app.services.notification_dispatcher import notification_dispatcher
 from app.models.email import EmailRequest
 
 router = APIRouter(prefix="/reservations", tags=["Reservations Management"])
-supabase_service = SupabaseService()
 
 # Modelo para actualizar fecha y hora
 class RescheduleReservation(BaseModel):
@@ -52,10 +52,18 @@ class RescheduleReservation(BaseModel):
                 raise ValueError("Formato de hora inválido. Use HH:MM (24 horas)")
             raise e
 
+def _reason_block(label: str, reason: Optional[str]) -> SafeHTML:
+    """Párrafo con el motivo del cambio, o vacío si no se indicó."""
+    if not reason:
+        return SafeHTML("")
+    return render_fragment("reason", {"label": label, "reason": reason})
+
 @router.put("/{reservation_id}/reschedule")
 async def reschedule_reservation(
     reservation_id: str,
-    reschedule_data: RescheduleReservation = Body(...)
+    background_tasks: BackgroundTasks,
+    reschedule_data: RescheduleReservation = Body(...),
+    supabase_service=Depends(get_async_supabase_service),
 ):
     """
     Modificar fecha y hora de una reservación existente con validaciones y notificaciones.
@@ -65,11 +73,11 @@ async def reschedule_reservation(
     - No permite cambios con menos de 24 horas de anticipación
     - Verifica horario del restaurante (12pm-10pm)
     - Verifica disponibilidad del restaurante
-    - Envía notificaciones por email
+    - Envía notificaciones por email en segundo plano (estado en /reservations/notifications/{notification_id})
     """
     try:
         # 1. Obtener la reservación actual
-        current_reservation = supabase_service.client.table("reservations")\
+        current_reservation = await supabase_service.client.table("reservations")\
             .select("*, restaurants(name, email)")\
             .eq("id", reservation_id)\
             .single()\
@@ -113,7 +121,7 @@ async def reschedule_reservation(
             )
         
         # 5. Buscar conflictos con otras reservaciones
-        conflicts = supabase_service.client.table("reservations")\
+        conflicts = await supabase_service.client.table("reservations")\
             .select("id")\
             .eq("restaurant_id", reservation_data["restaurant_id"])\
             .eq("reservation_date", reschedule_data.reservation_date)\
@@ -141,7 +149,7 @@ async def reschedule_reservation(
             "last_modified_time": reservation_data["reservation_time"]
         }
         
-        updated_reservation = supabase_service.client.table("reservations")\
+        updated_reservation = await supabase_service.client.table("reservations")\
             .update(update_data)\
             .eq("id", reservation_id)\
             .execute()
@@ -153,122 +161,65 @@ async def reschedule_reservation(
         restaurant_name = reservation_data.get("restaurants", {}).get("name", "Restaurante")
         customer_email = reservation_data.get("customer_email", "")
         customer_name = reservation_data.get("customer_name", "Cliente")
+        notifications = {}
+        email_context = {
+            "customer_name": customer_name,
+            "new_date": reschedule_data.reservation_date,
+            "new_time": reschedule_data.reservation_time[:5],
+            "old_date": reservation_data["reservation_date"],
+            "old_time": reservation_data["reservation_time"][:5],
+            "guests_count": reservation_data.get("guests_count", "N/A"),
+        }
         
-        # 8. Enviar email al cliente
+        # 8. Preparar email al cliente
         if customer_email:
             email_subject = f"Cambio de fecha/hora - Reservación en {restaurant_name}"
-            email_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; color: #333;">
-                <h2 style="color: #2c3e50;">Tu reservación ha sido modificada</h2>
-                
-                <p>Hola {customer_name},</p>
-                
-                <p>Te confirmamos que tu reservación ha sido actualizada exitosamente.</p>
-                
-                <div style="background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <h3 style="color: #28a745;">Nueva fecha y hora:</h3>
-                    <ul>
-                        <li><strong>Fecha:</strong> {reschedule_data.reservation_date}</li>
-                        <li><strong>Hora:</strong> {reschedule_data.reservation_time[:5]}</li>
-                        <li><strong>Restaurante:</strong> {restaurant_name}</li>
-                        <li><strong>Personas:</strong> {reservation_data.get('guests_count', 'N/A')}</li>
-                    </ul>
-                </div>
-                
-                <div style="background-color: #fff3cd; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <h4 style="color: #856404;">Fecha y hora anterior:</h4>
-                    <ul>
-                        <li><strong>Fecha:</strong> {reservation_data['reservation_date']}</li>
-                        <li><strong>Hora:</strong> {reservation_data['reservation_time'][:5]}</li>
-                    </ul>
-                </div>
-                
-                {f'<p><strong>Motivo del cambio:</strong> {reschedule_data.reason}</p>' if reschedule_data.reason else ''}
-                
-                <p style="color: #6c757d; font-size: 14px; margin-top: 30px;">
-                    Si necesitas hacer cambios adicionales, hazlo con al menos 24 horas de anticipación.
-                    Para cancelar tu reservación, contacta al restaurante directamente.
-                </p>
-                
-                <hr style="border: none; border-top: 1px solid #e0e0e0; margin: 30px 0;">
-                
-                <p style="color: #999; font-size: 12px;">
-                    Este es un correo automático de FoodAI. Por favor no respondas a este mensaje.
-                </p>
-            </body>
-            </html>
-            """
+            email_body = render_email("reservation_rescheduled_customer", {
+                **email_context,
+                "restaurant_name": restaurant_name,
+                "reason_block": _reason_block("Motivo del cambio:", reschedule_data.reason),
+            })
             
             try:
-                email_request = EmailRequest(
+                notifications["customer"] = EmailRequest(
                     to=customer_email,
                     subject=email_subject,
                     html=email_body
                 )
-                await send_email_via_api(email_request)
             except Exception as e:
-                print(f"Error enviando email al cliente: {e}")
+                print(f"Error preparando email al cliente: {e}")
         
-        # 9. Enviar notificación al restaurante
+        # 9. Preparar notificación al restaurante
         restaurant_email = reservation_data.get("restaurants", {}).get("email")
         if restaurant_email:
             restaurant_subject = f"Modificación de reservación - {customer_name}"
-            restaurant_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif;">
-                <h2>Notificación de cambio en reservación</h2>
-                
-                <p>Una reservación ha sido modificada en su restaurante.</p>
-                
-                <h3>Detalles del cambio:</h3>
-                <table style="border-collapse: collapse; width: 100%; margin: 20px 0;">
-                    <tr>
-                        <td style="border: 1px solid #ddd; padding: 8px;"><strong>Cliente:</strong></td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">{customer_name}</td>
-                    </tr>
-                    <tr>
-                        <td style="border: 1px solid #ddd; padding: 8px;"><strong>Nueva fecha:</strong></td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">{reschedule_data.reservation_date}</td>
-                    </tr>
-                    <tr>
-                        <td style="border: 1px solid #ddd; padding: 8px;"><strong>Nueva hora:</strong></td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">{reschedule_data.reservation_time[:5]}</td>
-                    </tr>
-                    <tr>
-                        <td style="border: 1px solid #ddd; padding: 8px;"><strong>Personas:</strong></td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">{reservation_data.get('guests_count', 'N/A')}</td>
-                    </tr>
-                    <tr style="background-color: #f8f9fa;">
-                        <td style="border: 1px solid #ddd; padding: 8px;"><strong>Fecha anterior:</strong></td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">{reservation_data['reservation_date']}</td>
-                    </tr>
-                    <tr style="background-color: #f8f9fa;">
-                        <td style="border: 1px solid #ddd; padding: 8px;"><strong>Hora anterior:</strong></td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">{reservation_data['reservation_time'][:5]}</td>
-                    </tr>
-                </table>
-                
-                {f'<p><strong>Motivo:</strong> {reschedule_data.reason}</p>' if reschedule_data.reason else ''}
-                
-                <p style="color: #666; font-size: 14px;">
-                    ID de reservación: {reservation_id}
-                </p>
-            </body>
-            </html>
-            """
+            restaurant_body = render_email("reservation_rescheduled_restaurant", {
+                **email_context,
+                "reservation_id": reservation_id,
+                "reason_block": _reason_block("Motivo:", reschedule_data.reason),
+            })
             
             try:
-                email_request = EmailRequest(
+                notifications["restaurant"] = EmailRequest(
                     to=restaurant_email,
                     subject=restaurant_subject,
                     html=restaurant_body
                 )
-                await send_email_via_api(email_request)
             except Exception as e:
-                print(f"Error enviando email al restaurante: {e}")
+                print(f"Error preparando email al restaurante: {e}")
+        
+        # 10. Enviar ambos emails en segundo plano, de forma concurrente (en Lambda, Mangum
+        #     espera la tarea antes de responder: `deliver` está acotado a esta notificación)
+        notification_id = None
+        if notifications:
+            try:
+                notification_id = await notification_dispatcher.queue(notifications)
+                background_tasks.add_task(notification_dispatcher.deliver, notification_id)
+            except Exception as e:
+                print(f"Error encolando notificaciones: {e}")
+                notifications = {}
         
-        # 10. Retornar respuesta exitosa
+        # 11. Retornar respuesta exitosa
         return {
             "success": True,
             "message": "Reservación actualizada exitosamente",
@@ -282,8 +233,9 @@ async def reschedule_reservation(
                 "time": reschedule_data.reservation_time[:5]
             },
             "emails_sent": {
-                "customer": bool(customer_email),
-                "restaurant": bool(restaurant_email)
+                "customer": "queued" if "customer" in notifications else False,
+                "restaurant": "queued" if "restaurant" in notifications else False,
+                "notification_id": notification_id
             }
         }
         
@@ -296,7 +248,8 @@ async def reschedule_reservation(
 async def check_availability(
     reservation_id: str,
     date: str,
-    time: str
+    time: str,
+    supabase_service=Depends(get_async_supabase_service),
 ):
     """
     Verificar disponibilidad antes de modificar una reservación.
@@ -304,7 +257,7 @@ async def check_availability(
     """
     try:
         # Obtener datos de la reservación
-        reservation = supabase_service.client.table("reservations")\
+        reservation = await supabase_service.client.table("reservations")\
             .select("restaurant_id")\
             .eq("id", reservation_id)\
             .single()\
@@ -314,7 +267,7 @@ async def check_availability(
             raise HTTPException(status_code=404, detail="Reservación no encontrada")
         
         # Verificar conflictos
-        conflicts = supabase_service.client.table("reservations")\
+        conflicts = await supabase_service.client.table("reservations")\
             .select("id")\
             .eq("restaurant_id", reservation.data["restaurant_id"])\
             .eq("reservation_date", date)\
@@ -336,4 +289,17 @@ async def check_availability(
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error verificando disponibilidad: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error verificando disponibilidad: {str(e)}")
+
+
+@router.get("/notifications/{notification_id}")
+async def get_notification_status(notification_id: str):
+    """
+    Estado de entrega de los emails enviados al modificar una reservación
+    (`queued`, `sending`, `sent` o `failed` por destinatario, con intentos y último error).
+    Las notificaciones entregadas o fallidas se conservan `EMAIL_OUTBOX_RETENTION_HOURS` horas.
+    """
+    status = await notification_dispatcher.status(notification_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Notificación no encontrada o expirada")
+    return status
@@ -1,21 +1,68 @@
-from fastapi import APIRouter, HTTPException
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from app.services.restaurant_insights_service import RestaurantAIInsightsService
-from app.services.supabase_service import SupabaseService
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_insights_service
+from app.models.insights import InsightsBatchRequest
 
 
 router = APIRouter(prefix="/restaurants", tags=["Restaurant Insights"])
 
-supabase_service = SupabaseService()
-insights_service = RestaurantAIInsightsService(supabase_service)
+
+@router.post("/ai-insights/batch")
+async def get_restaurants_ai_insights_batch(
+    payload: InsightsBatchRequest,
+    insights_service=Depends(get_insights_service),
+):
+    """
+    Insights de varios restaurantes con una sola lectura de reservaciones y restaurantes.
+    Responde NDJSON: una línea por restaurante, en cuanto su cálculo termina.
+    """
+    try:
+        sections = insights_service.resolve_sections(payload.sections)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+    try:
+        batch = await insights_service.aload_batch(payload.restaurant_ids)
+    except Exception as exc:  # pragma: no cover - FastAPI manejará los errores
+        raise HTTPException(status_code=500, detail=f"Error leyendo reservaciones: {exc}") from exc
+
+    return StreamingResponse(
+        _ndjson(insights_service.astream_batch_insights(batch, sections)),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.get("/{restaurant_id}/ai-insights")
-async def get_restaurant_ai_insights(restaurant_id: str):
-    """Retorna todos los indicadores predictivos para un restaurante."""
+async def get_restaurant_ai_insights(
+    restaurant_id: str,
+    sections: Optional[List[str]] = Query(
+        None,
+        description=(
+            "Secciones a calcular, separadas por coma (p. ej. `demand_capacity,operations`). "
+            "Sin este parámetro se calculan todas."
+        ),
+    ),
+    insights_service=Depends(get_insights_service),
+):
+    """Retorna los indicadores predictivos (todos o solo las secciones pedidas) para un restaurante."""
+    requested = [name.strip() for value in sections or [] for name in value.split(",") if name.strip()]
+    try:
+        requested = insights_service.resolve_sections(requested)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
     try:
-        return insights_service.generate_insights(restaurant_id)
+        return await insights_service.agenerate_insights(restaurant_id, requested)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - FastAPI manejará los errores
         raise HTTPException(status_code=500, detail=f"Error generando insights: {exc}") from exc
+
+
+async def _ndjson(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for result in results:
+        yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
@@ -0,0 +1,104 @@
+# app/core/executors.py
+"""Pools de ejecución del proceso: uno de hilos y uno de procesos compartidos, y uno para entrenar."""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+THREAD_POOL_WORKERS = int(os.getenv("THREAD_POOL_WORKERS", str(min(8, (os.cpu_count() or 1) + 2))))
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+_lock = threading.Lock()
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_unavailable = False
+_training_pool: Optional[Executor] = None
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Pool de hilos para trabajo de pandas/NumPy (muchos de sus kernels liberan el GIL)."""
+    global _thread_pool
+    if _thread_pool is None:
+        with _lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(
+                    max_workers=THREAD_POOL_WORKERS, thread_name_prefix="foodai-worker"
+                )
+    return _thread_pool
+
+
+def get_process_pool() -> Executor:
+    """
+    Pool de procesos para cálculos pesados en CPU.
+
+    Donde no se pueden crear procesos con colas compartidas (AWS Lambda no tiene
+    `/dev/shm`), devuelve el pool de hilos: quien lo use debe funcionar con ambos.
+    """
+    global _process_pool, _process_pool_unavailable
+    if _process_pool is not None:
+        return _process_pool
+    if _process_pool_unavailable:
+        return get_thread_pool()
+
+    with _lock:
+        if _process_pool is None and not _process_pool_unavailable:
+            try:
+                _process_pool = _new_process_pool(PROCESS_POOL_WORKERS)
+            except (OSError, NotImplementedError, ImportError) as exc:
+                print(f"Pool de procesos no disponible, se usarán hilos: {exc}")
+                _process_pool_unavailable = True
+    return _process_pool if _process_pool is not None else get_thread_pool()
+
+
+def get_training_pool() -> Executor:
+    """
+    Pool de un solo worker para entrenar modelos, aparte del pool compartido: un
+    entrenamiento no ocupa los workers de los cálculos de insights. Usa un hilo donde
+    no se pueden crear procesos.
+    """
+    global _training_pool
+    if _training_pool is None:
+        with _lock:
+            if _training_pool is None:
+                try:
+                    _training_pool = _new_process_pool(1)
+                except (OSError, NotImplementedError, ImportError) as exc:
+                    print(f"Pool de procesos no disponible para entrenar, se usará un hilo: {exc}")
+                    _training_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="foodai-training")
+    return _training_pool
+
+
+def reset_training_pool() -> None:
+    """Descarta el pool de entrenamiento (p. ej. tras `BrokenProcessPool`); el próximo uso crea otro."""
+    global _training_pool
+    with _lock:
+        pool, _training_pool = _training_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def reset_process_pool() -> None:
+    """Descarta el pool de procesos (p. ej. tras `BrokenProcessPool`); el próximo uso crea otro."""
+    global _process_pool
+    with _lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executors() -> None:
+    global _thread_pool, _process_pool, _training_pool
+    with _lock:
+        pools = [_thread_pool, _process_pool, _training_pool]
+        _thread_pool = _process_pool = _training_pool = None
+    for pool in pools:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    # `forkserver` evita heredar hilos y sockets del servidor al hacer fork
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
@@ -0,0 +1,22 @@
+# app/core/frames.py
+"""Esquemas declarados para DataFrames de trabajo: tipos compactos y solo las columnas usadas."""
+
+from typing import Dict, Mapping
+
+import pandas as pd
+
+
+def apply_schema(df: pd.DataFrame, schema: Mapping[str, str]) -> pd.DataFrame:
+    """
+    Conserva únicamente las columnas de `schema` (en ese orden) y las convierte a su tipo.
+
+    Las columnas declaradas que no existen en `df` se omiten; el resto del marco original
+    (columnas crudas de Supabase que ya no se usan) se descarta para liberar memoria.
+    """
+    columns = [column for column in schema if column in df.columns]
+    return df[columns].astype({column: schema[column] for column in columns})
+
+
+def frame_memory(df: pd.DataFrame) -> Dict[str, int]:
+    """Filas y bytes reales (`memory_usage(deep=True)`) de un DataFrame."""
+    return {"rows": int(len(df)), "memory_bytes": int(df.memory_usage(deep=True).sum())}
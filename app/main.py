@@ -1,3 +1,6 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import routes_analytics, routes_predict_ai
@@ -6,8 +9,28 @@ from app.api.v1.routes_health import router as health_router
 from app.api.v1.routes_email import router as email_router
 from app.api.v1.routes_reservations_update import router as reservations_update_router
 from app.api.v1.routes_restaurant_insights import router as restaurant_insights_router
+from app.core.executors import shutdown_executors
+from app.services.email_outbox import email_outbox
+from app.services.email_sender import close_email_client
+from app.services.email_templates import load_templates
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Solo corre con uvicorn: en Lambda (ver `handler`) los recursos se crean al primer uso
+    load_templates()
+    # Worker que entrega (y reintenta) los emails pendientes del outbox local
+    outbox_worker = asyncio.create_task(email_outbox.run_worker())
+    yield
+    outbox_worker.cancel()
+    with suppress(asyncio.CancelledError):
+        await outbox_worker
+    # Cerrar las conexiones compartidas al apagar la app
+    await close_email_client()
+    shutdown_executors()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,5 +51,7 @@ app.include_router(routes_analytics.router, prefix="/api/v1")
 app.include_router(routes_predict_ai.router, prefix="/api/v1")
 app.include_router(restaurant_insights_router, prefix="/api/v1")
 
-# handler para Lambda
-handler = Mangum(app)
+# handler para Lambda. Mangum ejecutaría el lifespan en cada invocación (cerrando el cliente
+# de email, los pools y el worker del outbox tras cada petición), así que se desactiva: el
+# cliente y los pools son perezosos y los emails pendientes se entregan con cada notificación.
+handler = Mangum(app, lifespan="off")
@@ -1,7 +1,13 @@
-from pydantic import BaseModel, EmailStr
+from typing import List
+
+from pydantic import BaseModel, EmailStr, Field
 
 
 class EmailRequest(BaseModel):
     to: EmailStr
     subject: str
     html: str
+
+
+class EmailBatchRequest(BaseModel):
+    emails: List[EmailRequest] = Field(..., min_length=1, max_length=1000)
@@ -0,0 +1,10 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class InsightsBatchRequest(BaseModel):
+    restaurant_ids: List[str] = Field(..., min_length=1, max_length=100)
+    sections: Optional[List[str]] = Field(
+        None, description="Secciones a calcular para cada restaurante (todas si se omite)"
+    )
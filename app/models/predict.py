@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 class PredictIn(BaseModel):
     day_of_week: int
@@ -7,3 +9,14 @@ class PredictIn(BaseModel):
 
 class PredictOut(BaseModel):
     demand: float
+
+
+class ReservaPrediccionIn(BaseModel):
+    restaurant_id: str
+    invitados: int = Field(..., ge=1)
+    hora: int = Field(..., ge=0, le=23, description="Hora de la reservación (0-23)")
+    dia_semana: int = Field(..., ge=0, le=6, description="Día de la semana (0=Lunes, 6=Domingo)")
+
+
+class PrediccionLoteIn(BaseModel):
+    reservas: List[ReservaPrediccionIn] = Field(..., min_length=1, max_length=10000)
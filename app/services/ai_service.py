@@ -1,19 +1,69 @@
+import copy
 import os
-import joblib
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from sklearn.cluster import KMeans
 
-# Rutas de guardado
+from app.core.frames import apply_schema, frame_memory
+from app.services.model_registry import ModeloCargado, RegistroModelos
+
+# Rutas de guardado: el paquete (modelo + codificadores + metadatos) se publica en un solo
+# archivo; los artefactos sueltos de versiones anteriores solo se leen mientras no exista
 MODELOS_DIR = "app/services/models"
+PAQUETE_MODELO_PATH = os.path.join(MODELOS_DIR, "paquete_modelo.pkl")
 MODELO_PATH = os.path.join(MODELOS_DIR, "modelo_reservas.pkl")
 ENCODER_ESTADO_PATH = os.path.join(MODELOS_DIR, "encoder_estado.pkl")
 ENCODER_RESTAURANTE_PATH = os.path.join(MODELOS_DIR, "encoder_restaurante.pkl")
+METADATOS_PATH = os.path.join(MODELOS_DIR, "metadatos_entrenamiento.json")
+
+# Tamaño del bosque: árboles del entrenamiento completo, árboles que agrega cada
+# entrenamiento incremental y tope a partir del cual se reentrena desde cero
+ARBOLES_INICIALES = 150
+ARBOLES_POR_INCREMENTO = 25
+MAX_ARBOLES = 600
+# Con menos reservaciones nuevas no se actualiza el modelo (se acumulan para la próxima vez)
+MIN_FILAS_INCREMENTO = 50
+# Árboles construidos en paralelo al entrenar. Por defecto la mitad de los núcleos: el resto
+# queda para el pool de procesos que calcula los insights
+N_JOBS_ENTRENAMIENTO = int(os.getenv("TRAINING_N_JOBS", str(max(1, (os.cpu_count() or 1) // 2))))
+
+# Modelo y codificadores compartidos por todas las peticiones del proceso
+registro_modelos = RegistroModelos(
+    PAQUETE_MODELO_PATH,
+    rutas_legado=(MODELO_PATH, ENCODER_ESTADO_PATH, ENCODER_RESTAURANTE_PATH, METADATOS_PATH),
+)
+
+
+class RequiereEntrenamientoCompleto(Exception):
+    """El modelo publicado no se puede actualizar de forma incremental."""
+
+
+class CodificadorIncremental(LabelEncoder):
+    """
+    LabelEncoder que acepta clases nuevas al final sin cambiar el código de las existentes.
+    Como las clases dejan de estar ordenadas, `transform` usa un índice hash en vez de `searchsorted`.
+    """
+
+    def transform(self, y):
+        codigos = pd.Index(self.classes_, dtype=object).get_indexer(pd.Index(np.asarray(y, dtype=object)))
+        if (codigos < 0).any():
+            raise ValueError("y contiene etiquetas que el codificador no conoce")
+        return codigos
+
+    @classmethod
+    def ampliado(cls, encoder: LabelEncoder, valores) -> "CodificadorIncremental":
+        """Copia de `encoder` con las clases nuevas de `valores` agregadas al final."""
+        clases = np.asarray(encoder.classes_, dtype=object)
+        nuevas = sorted(set(pd.unique(np.asarray(valores, dtype=object))) - set(clases))
+        resultado = cls()
+        resultado.classes_ = np.concatenate([clases, np.asarray(nuevas, dtype=object)])
+        return resultado
 
 
 class InteligenciaReservas:
@@ -24,6 +74,20 @@ class InteligenciaReservas:
       - Recomendaciones de restaurante y horario
     """
 
+    # Únicas columnas de `reservations` que usa el análisis
+    COLUMNAS_REQUERIDAS = ("status", "guests_count", "reservation_time", "reservation_date", "restaurant_id")
+    # Columnas con las que se calcula la marca de agua del entrenamiento
+    COLUMNAS_MARCA_AGUA = ("created_at", "updated_at")
+
+    # Esquema compacto de los datos preparados (agrupar categorías con `observed=True`)
+    ESQUEMA_PREPARADO = {
+        "restaurant_id": "category",
+        "status": "category",
+        "hora": "int8",
+        "dia_semana": "int8",
+        "guests_count": "int16",
+    }
+
     def __init__(self, df_reservas: pd.DataFrame, df_restaurantes: pd.DataFrame = None):
         self.df_reservas = df_reservas
         self.df_restaurantes = df_restaurantes
@@ -35,7 +99,7 @@ class InteligenciaReservas:
         """Limpia los datos y genera las columnas necesarias para el análisis."""
         df = self.df_reservas.copy()
 
-        columnas_requeridas = {"status", "guests_count", "reservation_time", "reservation_date", "restaurant_id"}
+        columnas_requeridas = set(self.COLUMNAS_REQUERIDAS)
         faltantes = columnas_requeridas - set(df.columns)
         if faltantes:
             raise ValueError(f"Faltan columnas necesarias: {faltantes}")
@@ -49,7 +113,7 @@ class InteligenciaReservas:
         df["dia_semana"] = pd.to_datetime(df["reservation_date"], errors="coerce").dt.dayofweek.fillna(0).astype(int)
         df["guests_count"] = df["guests_count"].astype(int)
 
-        return df
+        return apply_schema(df, self.ESQUEMA_PREPARADO)
 
     # ==========================
     # 🤖 ENTRENAMIENTO
@@ -61,77 +125,160 @@ class InteligenciaReservas:
 
             # Crear codificadores
             encoder_estado = LabelEncoder()
-            encoder_restaurante = LabelEncoder()
+            encoder_restaurante = CodificadorIncremental()
 
             df["estado_cod"] = encoder_estado.fit_transform(df["status"])
             df["restaurante_cod"] = encoder_restaurante.fit_transform(df["restaurant_id"])
 
-            X = df[["restaurante_cod", "hora", "dia_semana", "guests_count"]]
-            y = df["estado_cod"]
+            # Matriz NumPy con el mismo orden de columnas que usa `PredictorReservas.predecir_lote`
+            X = df[["restaurante_cod", "hora", "dia_semana", "guests_count"]].to_numpy()
+            y = df["estado_cod"].to_numpy()
 
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            modelo = RandomForestClassifier(n_estimators=150, random_state=42)
+            modelo = RandomForestClassifier(
+                n_estimators=ARBOLES_INICIALES, random_state=42, n_jobs=N_JOBS_ENTRENAMIENTO
+            )
             modelo.fit(X_train, y_train)
+            # Las predicciones son de pocas filas: sin pool de hilos por llamada
+            modelo.set_params(n_jobs=None)
 
             y_pred = modelo.predict(X_test)
             precision = accuracy_score(y_test, y_pred)
 
-            os.makedirs(MODELOS_DIR, exist_ok=True)
-            joblib.dump(modelo, MODELO_PATH)
-            joblib.dump(encoder_estado, ENCODER_ESTADO_PATH)
-            joblib.dump(encoder_restaurante, ENCODER_RESTAURANTE_PATH)
+            metadatos = {
+                "modo": "completo",
+                "marca_agua": self._marca_agua(),
+                "filas": int(len(df)),
+                "arboles": modelo.n_estimators,
+                "incrementos": 0,
+                "fecha": datetime.now().isoformat(),
+            }
+            registro_modelos.publicar(modelo, encoder_estado, encoder_restaurante, metadatos)
 
             return {
                 "mensaje": "Modelo entrenado correctamente",
+                "modo": "completo",
                 "precision": round(precision * 100, 2),
-                "fecha": datetime.now().isoformat()
+                "fecha": metadatos["fecha"],
+                "arboles": modelo.n_estimators,
+                "marca_agua": metadatos["marca_agua"],
+                "datos": frame_memory(df),
             }
 
         except Exception as e:
             return {"error": f"Ocurrió un error al entrenar el modelo: {str(e)}"}
 
-    # ==========================
-    # 🔮 PREDICCIÓN
-    # ==========================
-    def predecir_estado(self, restaurant_id: str, invitados: int, hora: int, dia_semana: int):
-        """Predice si una reserva será confirmada, cancelada o completada."""
-        try:
-            if not os.path.exists(MODELO_PATH):
-                return {"error": "El modelo aún no ha sido entrenado."}
-
-            modelo = joblib.load(MODELO_PATH)
-            encoder_estado = joblib.load(ENCODER_ESTADO_PATH)
-            encoder_restaurante = joblib.load(ENCODER_RESTAURANTE_PATH)
-
-            try:
-                rest_cod = encoder_restaurante.transform([restaurant_id])[0]
-            except ValueError:
-                rest_cod = 0  # Si no existe, asignar valor por defecto
+    def entrenar_incremental(self, cargado: ModeloCargado):
+        """
+        Agrega `ARBOLES_POR_INCREMENTO` árboles, entrenados solo con `df_reservas` (las
+        reservaciones nuevas o modificadas desde la marca de agua), al bosque publicado.
 
-            entrada = pd.DataFrame([{
-                "restaurante_cod": rest_cod,
-                "hora": hora,
-                "dia_semana": dia_semana,
-                "guests_count": invitados
-            }])
+        Lanza `RequiereEntrenamientoCompleto` si aparece un estado que el modelo no conoce
+        o si el bosque superaría `MAX_ARBOLES`.
+        """
+        metadatos = cargado.metadatos
+        modelo_publicado = cargado.modelo
+        if not hasattr(modelo_publicado, "estimators_"):
+            raise RequiereEntrenamientoCompleto("El modelo publicado no admite árboles adicionales.")
+        if modelo_publicado.n_estimators + ARBOLES_POR_INCREMENTO > MAX_ARBOLES:
+            raise RequiereEntrenamientoCompleto(f"El bosque alcanzó el máximo de {MAX_ARBOLES} árboles.")
 
-            pred = modelo.predict(entrada)
-            proba = modelo.predict_proba(entrada)
+        try:
+            df = self.preparar_datos() if not self.df_reservas.empty else self.df_reservas
+            if len(df) < MIN_FILAS_INCREMENTO:
+                return {
+                    "mensaje": (
+                        f"Hay {len(df)} reservaciones nuevas; se necesitan al menos "
+                        f"{MIN_FILAS_INCREMENTO} para actualizar el modelo."
+                        if len(df)
+                        else "No hay reservaciones nuevas desde el último entrenamiento."
+                    ),
+                    "modo": "incremental",
+                    "filas_nuevas": int(len(df)),
+                    "arboles": modelo_publicado.n_estimators,
+                    "marca_agua": metadatos.get("marca_agua"),
+                }
+
+            y = pd.Index(cargado.encoder_estado.classes_, dtype=object).get_indexer(
+                pd.Index(np.asarray(df["status"], dtype=object))
+            )
+            if (y < 0).any():
+                raise RequiereEntrenamientoCompleto("Aparecieron estados de reservación nuevos.")
+
+            # Restaurantes nuevos: se agregan al final, los códigos existentes no cambian
+            encoder_restaurante = CodificadorIncremental.ampliado(cargado.encoder_restaurante, df["restaurant_id"])
+            X = np.column_stack([
+                encoder_restaurante.transform(df["restaurant_id"]),
+                df["hora"].to_numpy(dtype=np.int64),
+                df["dia_semana"].to_numpy(dtype=np.int64),
+                df["guests_count"].to_numpy(dtype=np.int64),
+            ])
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-            try:
-                estado_predicho = encoder_estado.inverse_transform(pred)[0]
-            except Exception:
-                estado_predicho = "desconocido"
+            # `warm_start` recalcula `classes_` en cada fit: una fila ancla con peso 0 por clase
+            # conocida mantiene la forma de `predict_proba` de los árboles anteriores
+            clases = modelo_publicado.classes_
+            X_fit = np.vstack([X_train, np.repeat(X_train[:1], len(clases), axis=0)])
+            y_fit = np.concatenate([y_train, clases])
+            pesos = np.concatenate([np.ones(len(y_train)), np.zeros(len(clases))])
+
+            # Copia: las peticiones en curso siguen usando el modelo publicado
+            modelo = copy.deepcopy(modelo_publicado)
+            modelo.set_params(
+                warm_start=True,
+                n_estimators=modelo.n_estimators + ARBOLES_POR_INCREMENTO,
+                n_jobs=N_JOBS_ENTRENAMIENTO,
+            )
+            columnas = getattr(modelo, "feature_names_in_", None)
+            if columnas is not None:
+                # Modelos entrenados con DataFrame esperan los mismos nombres de columnas
+                X_fit, X_test = pd.DataFrame(X_fit, columns=columnas), pd.DataFrame(X_test, columns=columnas)
+            modelo.fit(X_fit, y_fit, sample_weight=pesos)
+            modelo.set_params(n_jobs=None)
+            precision = accuracy_score(y_test, modelo.predict(X_test))
+
+            marca_agua = max(filter(None, [metadatos.get("marca_agua"), self._marca_agua()]), default=None)
+            nuevos_metadatos = {
+                "modo": "incremental",
+                "marca_agua": marca_agua,
+                "filas": int(metadatos.get("filas", 0)) + int(len(df)),
+                "arboles": modelo.n_estimators,
+                "incrementos": int(metadatos.get("incrementos", 0)) + 1,
+                "fecha": datetime.now().isoformat(),
+            }
+            registro_modelos.publicar(modelo, cargado.encoder_estado, encoder_restaurante, nuevos_metadatos)
 
             return {
-                "estado_estimado": estado_predicho,
-                "confianza": round(float(np.max(proba)) * 100, 2),
-                "hora": hora,
-                "dia_semana": dia_semana
+                "mensaje": "Modelo actualizado con las reservaciones nuevas",
+                "modo": "incremental",
+                "precision_nuevas": round(precision * 100, 2),
+                "fecha": nuevos_metadatos["fecha"],
+                "filas_nuevas": int(len(df)),
+                "restaurantes_nuevos": len(encoder_restaurante.classes_) - len(cargado.encoder_restaurante.classes_),
+                "arboles": modelo.n_estimators,
+                "marca_agua": marca_agua,
             }
 
+        except RequiereEntrenamientoCompleto:
+            raise
         except Exception as e:
-            return {"error": f"Ocurrió un error al predecir: {str(e)}"}
+            return {"error": f"Ocurrió un error al actualizar el modelo: {str(e)}"}
+
+    def _marca_agua(self) -> Optional[str]:
+        """Fecha más reciente de creación o modificación entre las reservaciones recibidas."""
+        fechas = [
+            self.df_reservas[columna].dropna().max()
+            for columna in self.COLUMNAS_MARCA_AGUA
+            if columna in self.df_reservas.columns and self.df_reservas[columna].notna().any()
+        ]
+        return str(max(fechas)) if fechas else None
+
+    # ==========================
+    # 🔮 PREDICCIÓN
+    # ==========================
+    def predecir_estado(self, restaurant_id: str, invitados: int, hora: int, dia_semana: int):
+        """Predice si una reserva será confirmada, cancelada o completada."""
+        return PredictorReservas().predecir_estado(restaurant_id, invitados, hora, dia_semana)
 
     # ==========================
     # 🌟 RECOMENDACIÓN
@@ -150,7 +297,7 @@ class InteligenciaReservas:
 
             # Agrupar por restaurante y hora
             resumen = (
-                df_exitos.groupby(["restaurant_id", "hora"])
+                df_exitos.groupby(["restaurant_id", "hora"], observed=True)
                 .size()
                 .reset_index(name="reservas")
                 .sort_values(by="reservas", ascending=False)
@@ -200,3 +347,116 @@ class InteligenciaReservas:
 
         except Exception as e:
             return {"error": f"No se pudieron generar recomendaciones: {str(e)}"}
+
+
+def entrenar_desde_supabase(supabase, modo: str = "completo") -> Dict[str, Any]:
+    """
+    Lee de Supabase lo necesario y entrena el modelo.
+
+    En modo `incremental` solo se leen las reservaciones creadas o modificadas después de la
+    marca de agua del modelo publicado; si no hay modelo, marca de agua o no se puede
+    actualizar, se hace un entrenamiento completo (indicando el motivo).
+    """
+    columnas = InteligenciaReservas.COLUMNAS_REQUERIDAS + InteligenciaReservas.COLUMNAS_MARCA_AGUA
+    motivo = None
+    if modo == "incremental":
+        cargado = registro_modelos.obtener()
+        marca_agua = cargado.metadatos.get("marca_agua") if cargado is not None else None
+        if marca_agua:
+            df_nuevas = supabase.get_reservations_df(
+                columns=columnas,
+                where=lambda query: query.or_(f'created_at.gt."{marca_agua}",updated_at.gt."{marca_agua}"'),
+            )
+            try:
+                return InteligenciaReservas(df_nuevas).entrenar_incremental(cargado)
+            except RequiereEntrenamientoCompleto as exc:
+                motivo = str(exc)
+        else:
+            motivo = "No hay un modelo con marca de agua para actualizar."
+
+    resultado = InteligenciaReservas(supabase.get_reservations_df(columns=columnas)).entrenar_modelo()
+    if motivo and "error" not in resultado:
+        resultado["motivo"] = motivo
+    return resultado
+
+
+class PredictorReservas:
+    """
+    Servicio de predicción que solo depende del modelo entrenado.
+    No consulta Supabase: la latencia no crece con el tamaño de la tabla de reservaciones.
+    """
+
+    def __init__(self, registro: RegistroModelos = registro_modelos):
+        self.registro = registro
+
+    def predecir_estado(self, restaurant_id: str, invitados: int, hora: int, dia_semana: int):
+        """Predice si una reserva será confirmada, cancelada o completada."""
+        try:
+            resultado = self.predecir_lote([restaurant_id], [invitados], [hora], [dia_semana])
+            if "error" in resultado:
+                return resultado
+
+            prediccion = resultado["predicciones"][0]
+            return {
+                "estado_estimado": prediccion["estado_estimado"],
+                "confianza": prediccion["confianza"],
+                "hora": hora,
+                "dia_semana": dia_semana
+            }
+
+        except Exception as e:
+            return {"error": f"Ocurrió un error al predecir: {str(e)}"}
+
+    def predecir_lote(
+        self,
+        restaurant_ids: Sequence[str],
+        invitados: Sequence[int],
+        horas: Sequence[int],
+        dias_semana: Sequence[int],
+    ):
+        """
+        Predice el estado de muchas reservas con una sola llamada a `predict_proba`.
+        Los restaurantes se codifican con una búsqueda vectorizada; los desconocidos reciben el código 0.
+        """
+        cargado = self.registro.obtener()
+        if cargado is None:
+            return {"error": "El modelo aún no ha sido entrenado."}
+
+        codigos = cargado.indice_restaurantes.get_indexer(pd.Index(restaurant_ids, dtype=object))
+        codigos[codigos < 0] = 0  # Si no existe, asignar valor por defecto
+
+        entrada = np.column_stack([
+            codigos,
+            np.asarray(horas, dtype=np.int64),
+            np.asarray(dias_semana, dtype=np.int64),
+            np.asarray(invitados, dtype=np.int64),
+        ])
+        modelo = cargado.modelo
+        if hasattr(modelo, "feature_names_in_"):
+            # Modelos entrenados con DataFrame esperan los mismos nombres de columnas
+            entrada = pd.DataFrame(entrada, columns=modelo.feature_names_in_)
+
+        proba = modelo.predict_proba(entrada)
+        pred = modelo.classes_[proba.argmax(axis=1)]
+        confianzas = np.round(proba.max(axis=1) * 100, 2)
+
+        try:
+            estados = cargado.encoder_estado.inverse_transform(pred)
+        except Exception:
+            estados = np.full(len(pred), "desconocido", dtype=object)
+
+        predicciones = [
+            {
+                "restaurant_id": rest_id,
+                "estado_estimado": estado,
+                "confianza": float(confianza),
+                "invitados": int(n_invitados),
+                "hora": int(hora),
+                "dia_semana": int(dia),
+            }
+            for rest_id, estado, confianza, n_invitados, hora, dia in zip(
+                restaurant_ids, estados.tolist(), confianzas, invitados, horas, dias_semana
+            )
+        ]
+
+        return {"total": len(predicciones), "predicciones": predicciones}
@@ -0,0 +1,307 @@
+"""Durable local outbox for outgoing emails.
+
+Callers enqueue emails with a fast local SQLite write; a worker drains the outbox
+with bounded concurrency, retrying failed sends with exponential backoff. Delivery
+throughput is therefore decoupled from the latency (or outages) of the email API.
+SQLite calls are blocking (they may wait on the busy timeout), so the async paths
+run them in a worker thread.
+
+The database lives in the temp dir by default (`/tmp` is the only writable path on
+Lambda); set `EMAIL_OUTBOX_PATH` to move it. Sent and failed rows are deleted once they
+are older than `EMAIL_OUTBOX_RETENTION_HOURS` (24 by default).
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.email import EmailRequest
+from app.services.email_sender import EmailServiceError, send_email_via_api
+
+OUTBOX_PATH = os.getenv(
+    "EMAIL_OUTBOX_PATH", os.path.join(tempfile.gettempdir(), "foodai_email_outbox.sqlite3")
+)
+OUTBOX_RETENTION_SECONDS = float(os.getenv("EMAIL_OUTBOX_RETENTION_HOURS", "24")) * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id TEXT,
+    label TEXT,
+    recipient TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_group ON email_outbox (group_id);
+"""
+
+
+class EmailOutbox:
+    """SQLite-backed queue of emails with retry bookkeeping.
+
+    Row states: `queued` (waiting or retrying), `sending` (claimed by a worker),
+    `sent` and `failed` (gave up after `max_attempts` or a non-retryable error).
+    """
+
+    def __init__(
+        self,
+        path: str = OUTBOX_PATH,
+        *,
+        batch_size: int = 50,
+        concurrency: int = 8,
+        max_attempts: int = 6,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        claim_timeout: float = 120.0,
+        retention: float = OUTBOX_RETENTION_SECONDS,
+        purge_interval: float = 600.0,
+    ) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._initialized = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.worker_running = False
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def enqueue(self, email: EmailRequest, *, group_id: Optional[str] = None, label: Optional[str] = None) -> int:
+        """Persist a single email and return its outbox id."""
+        return self.enqueue_many({label or "email": email}, group_id=group_id)[0]
+
+    def enqueue_many(self, emails: Dict[str, EmailRequest], *, group_id: Optional[str] = None) -> List[int]:
+        """Persist several emails (keyed by label) in one transaction and return their ids."""
+        now = time.time()
+        ids: List[int] = []
+        with self._connect() as conn:
+            for label, email in emails.items():
+                cursor = conn.execute(
+                    "INSERT INTO email_outbox (group_id, label, recipient, payload, next_attempt_at, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (group_id, label, email.to, email.model_dump_json(), now, now, now),
+                )
+                ids.append(cursor.lastrowid)
+        self.notify()
+        return ids
+
+    def group_status(self, group_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Delivery status of every email enqueued under `group_id`, keyed by label."""
+        with self._connect(write=False) as conn:
+            rows = conn.execute(
+                "SELECT label, recipient, status, attempts, last_error, updated_at"
+                " FROM email_outbox WHERE group_id = ? ORDER BY id",
+                (group_id,),
+            ).fetchall()
+        if not rows:
+            return None
+        return {
+            label: {
+                "to": recipient,
+                "status": status,
+                "attempts": attempts,
+                "last_error": last_error,
+                "updated_at": updated_at,
+            }
+            for label, recipient, status, attempts, last_error, updated_at in rows
+        }
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    async def drain(self, *, group_id: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, int]:
+        """Claim one batch of due emails, send them concurrently and record the outcomes.
+
+        `group_id` restricts the batch to one notification's emails and `limit` caps its
+        size (default `batch_size`). Returns counters for the batch (`claimed`, `sent`,
+        `retrying`, `failed`).
+        """
+        if time.time() - self._last_purge >= self.purge_interval:
+            await asyncio.to_thread(self.purge)
+        batch = await asyncio.to_thread(self._claim_batch, group_id, limit)
+        if not batch:
+            return {"claimed": 0, "sent": 0, "retrying": 0, "failed": 0}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _send(row_id: int, attempts: int, payload: str) -> Tuple[int, int, Optional[Exception]]:
+            async with semaphore:
+                try:
+                    await send_email_via_api(EmailRequest.model_validate_json(payload))
+                    return row_id, attempts, None
+                except Exception as exc:
+                    return row_id, attempts, exc
+
+        outcomes = await asyncio.gather(*(_send(*row) for row in batch))
+        return await asyncio.to_thread(self._record, outcomes)
+
+    async def drain_all(self) -> int:
+        """Drain batches until nothing is due; returns the number of emails sent."""
+        sent = 0
+        while True:
+            result = await self.drain()
+            sent += result["sent"]
+            if result["claimed"] < self.batch_size:
+                return sent
+
+    async def run_worker(self, poll_interval: float = 5.0) -> None:
+        """Drain the outbox forever; wakes up early when new emails are enqueued."""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self.worker_running = True
+        try:
+            while True:
+                try:
+                    await self.drain_all()
+                except Exception as exc:  # keep the worker alive on unexpected errors
+                    print(f"Error procesando el outbox de emails: {exc}")
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self.worker_running = False
+
+    def purge(self) -> int:
+        """Delete `sent` and `failed` rows last updated more than `retention` seconds ago."""
+        now = time.time()
+        self._last_purge = now
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM email_outbox WHERE status IN ('sent', 'failed') AND updated_at < ?",
+                (now - self.retention,),
+            )
+        return cursor.rowcount
+
+    def notify(self) -> None:
+        """Wake the worker up; safe to call from any thread (enqueues run off the event loop)."""
+        if self._wakeup is None or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:  # the worker's loop is already closed
+            pass
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _connect(self, write: bool = True) -> "_Transaction":
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        if not self._initialized:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._initialized = True
+        return _Transaction(conn, "BEGIN IMMEDIATE" if write else "BEGIN")
+
+    def _claim_batch(self, group_id: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[int, int, str]]:
+        now = time.time()
+        due = (
+            "((status = 'queued' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_at <= ?))"
+        )
+        params: List[Any] = [now, now - self.claim_timeout]
+        if group_id is not None:
+            due += " AND group_id = ?"
+            params.append(group_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, attempts, payload FROM email_outbox WHERE {due} ORDER BY next_attempt_at LIMIT ?",
+                (*params, limit or self.batch_size),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sending', claimed_at = ?, updated_at = ? WHERE id = ?",
+                [(now, now, row_id) for row_id, _, _ in rows],
+            )
+        return rows
+
+    def _record(self, outcomes: List[Tuple[int, int, Optional[Exception]]]) -> Dict[str, int]:
+        now = time.time()
+        sent, retrying, failed = [], [], []
+        for row_id, attempts, error in outcomes:
+            attempts += 1
+            if error is None:
+                sent.append((attempts, now, row_id))
+            elif attempts >= self.max_attempts or not self._is_retryable(error):
+                failed.append((attempts, str(error), now, row_id))
+            else:
+                retrying.append((attempts, now + self._backoff(attempts), str(error), now, row_id))
+
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sent', attempts = ?, last_error = NULL, updated_at = ?"
+                " WHERE id = ?",
+                sent,
+            )
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'queued', attempts = ?, next_attempt_at = ?, last_error = ?,"
+                " updated_at = ? WHERE id = ?",
+                retrying,
+            )
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'failed', attempts = ?, last_error = ?, updated_at = ?"
+                " WHERE id = ?",
+                failed,
+            )
+
+        return {"claimed": len(outcomes), "sent": len(sent), "retrying": len(retrying), "failed": len(failed)}
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        # Client errors (bad payload, auth) will not succeed on retry; throttling will.
+        if isinstance(error, EmailServiceError) and error.status_code is not None:
+            return error.status_code >= 500 or error.status_code == 429
+        return True
+
+
+class _Transaction:
+    """Context manager running a block inside one transaction and closing the connection."""
+
+    def __init__(self, conn: sqlite3.Connection, begin: str) -> None:
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self) -> sqlite3.Connection:
+        try:
+            self.conn.execute(self.begin)
+        except Exception:
+            # e.g. "database is locked": __exit__ will not run, so close here
+            self.conn.close()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+email_outbox = EmailOutbox()
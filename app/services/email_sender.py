@@ -1,4 +1,6 @@
-from typing import Any, Dict
+import asyncio
+import time
+from typing import Any, Dict, List, Sequence
 
 import httpx
 
@@ -6,6 +8,12 @@ from app.models.email import EmailRequest
 
 EMAIL_API_URL = "https://mnnd3b5qhrn3bwcalbtddbg7p40lbsgr.lambda-url.us-east-2.on.aws/"
 
+EMAIL_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+EMAIL_POOL_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0)
+DEFAULT_BATCH_CONCURRENCY = 20
+
+_client: httpx.AsyncClient | None = None
+
 
 class EmailServiceError(RuntimeError):
     """Raised when the external email API call fails."""
@@ -15,24 +23,82 @@ class EmailServiceError(RuntimeError):
         self.status_code = status_code
 
 
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_email_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use.
+
+    Connections to the email API are kept alive and reused across sends.
+    HTTP/2 is enabled when the optional `h2` package is installed (`httpx[http2]`).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=EMAIL_TIMEOUT,
+            limits=EMAIL_POOL_LIMITS,
+            http2=_http2_available(),
+        )
+    return _client
+
+
+async def close_email_client() -> None:
+    """Close the shared client and its pooled connections (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
 async def send_email_via_api(payload: EmailRequest) -> Dict[str, Any]:
     """Forward the email payload to the external provider and return its JSON response."""
-    async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=5.0)) as client:
-        try:
-            response = await client.post(EMAIL_API_URL, json=payload.model_dump())
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            # Propagate status errors with context for upstream handling.
-            raise EmailServiceError(
-                f"Email API responded with status {exc.response.status_code}",
-                status_code=exc.response.status_code,
-            ) from exc
-        except httpx.HTTPError as exc:
-            # Catch network, timeout and protocol issues.
-            raise EmailServiceError("Error while calling the email API") from exc
+    client = get_email_client()
+    try:
+        response = await client.post(EMAIL_API_URL, json=payload.model_dump())
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        # Propagate status errors with context for upstream handling.
+        raise EmailServiceError(
+            f"Email API responded with status {exc.response.status_code}",
+            status_code=exc.response.status_code,
+        ) from exc
+    except httpx.HTTPError as exc:
+        # Catch network, timeout and protocol issues.
+        raise EmailServiceError("Error while calling the email API") from exc
 
     if response.headers.get("content-type", "").startswith("application/json"):
         return response.json()
 
     # Fallback to raw text if no JSON is returned.
     return {"message": response.text}
+
+
+async def send_emails_concurrently(
+    payloads: Sequence[EmailRequest], concurrency: int = DEFAULT_BATCH_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """Send many emails over the shared connection pool, at most `concurrency` at a time.
+
+    Never raises for individual failures: returns one result per payload, in input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _send(index: int, payload: EmailRequest) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            result: Dict[str, Any] = {"index": index, "to": payload.to}
+            try:
+                result.update(status="sent", response=await send_email_via_api(payload))
+            except EmailServiceError as exc:
+                result.update(status="failed", error=str(exc), status_code=exc.status_code)
+            except Exception as exc:
+                # e.g. an invalid JSON body from a gateway: only this email fails, not the batch.
+                result.update(status="failed", error=str(exc) or type(exc).__name__, status_code=None)
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return result
+
+    return await asyncio.gather(*(_send(index, payload) for index, payload in enumerate(payloads)))
@@ -0,0 +1,68 @@
+"""Precompiled HTML templates for notification emails.
+
+Templates live in `app/services/templates/email/<name>.html` and use `string.Template`
+placeholders (`$customer_name`). Each file is read and compiled once per process into
+a list of literal chunks and placeholder names, so a render is a single `str.join`.
+Context values are HTML-escaped unless wrapped in `SafeHTML` (used for fragments
+rendered from other templates).
+"""
+
+import html
+import os
+from functools import lru_cache
+from string import Template
+from typing import Any, Iterable, List, Mapping, Tuple
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates", "email")
+
+
+class SafeHTML(str):
+    """Marks an already-rendered HTML fragment so it is inserted without escaping."""
+
+
+class CompiledTemplate:
+    """A `string.Template` split once into literal chunks and placeholder names."""
+
+    def __init__(self, source: str) -> None:
+        self.parts: List[Tuple[bool, str]] = []
+        position = 0
+        for match in Template.pattern.finditer(source):
+            self.parts.append((False, source[position:match.start()]))
+            if match.group("escaped") is not None:
+                self.parts.append((False, "$"))
+            elif match.group("invalid") is not None:
+                raise ValueError(f"Invalid placeholder at position {match.start()}")
+            else:
+                self.parts.append((True, match.group("named") or match.group("braced")))
+            position = match.end()
+        self.parts.append((False, source[position:]))
+
+    def substitute(self, context: Mapping[str, str]) -> str:
+        return "".join(context[value] if is_name else value for is_name, value in self.parts)
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> CompiledTemplate:
+    """Load and compile `<name>.html` once; later calls return the cached template."""
+    with open(os.path.join(TEMPLATES_DIR, f"{name}.html"), encoding="utf-8") as handle:
+        return CompiledTemplate(handle.read())
+
+
+def load_templates(names: Iterable[str] | None = None) -> None:
+    """Compile templates ahead of the first request (all of them by default)."""
+    if names is None:
+        names = [file[: -len(".html")] for file in os.listdir(TEMPLATES_DIR) if file.endswith(".html")]
+    for name in names:
+        get_template(name)
+
+
+def render_email(name: str, context: Mapping[str, Any]) -> str:
+    """Render template `name` with `context`; raises KeyError if a placeholder is missing."""
+    return get_template(name).substitute(
+        {key: value if isinstance(value, SafeHTML) else html.escape(str(value)) for key, value in context.items()}
+    )
+
+
+def render_fragment(name: str, context: Mapping[str, Any]) -> SafeHTML:
+    """Render a partial template to embed inside another template."""
+    return SafeHTML(render_email(name, context))
@@ -0,0 +1,148 @@
+"""Registro en memoria del modelo de reservas y sus codificadores."""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import joblib
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ModeloCargado:
+    """Instantánea inmutable de un modelo y los codificadores con los que se entrenó."""
+
+    modelo: Any
+    encoder_estado: Any
+    encoder_restaurante: Any
+    version: Tuple[Tuple[int, int], ...]
+    # Datos del último entrenamiento (marca de agua, filas, árboles...); vacío en artefactos viejos
+    metadatos: Dict[str, Any] = field(default_factory=dict)
+
+    @cached_property
+    def indice_restaurantes(self) -> pd.Index:
+        """Índice hash de `restaurant_id` -> código, para codificar lotes sin `transform` por elemento."""
+        return pd.Index(self.encoder_restaurante.classes_, dtype=object)
+
+
+class RegistroModelos:
+    """
+    Mantiene el modelo y sus codificadores cargados una sola vez por proceso.
+
+    Modelo, codificadores y metadatos se publican juntos en un solo archivo (`paquete_path`)
+    que se reemplaza con un único `os.replace`: quien lo lee obtiene siempre un conjunto
+    completo, nunca un modelo nuevo con codificadores viejos (un reentrenamiento completo
+    reordena los códigos de restaurante). La versión es el mtime y el tamaño del paquete;
+    si cambia en disco (por ejemplo, otro proceso reentrenó), la siguiente consulta
+    recarga y reemplaza la instantánea de una sola vez.
+
+    Mientras no exista el paquete se leen los artefactos sueltos de versiones anteriores
+    (`rutas_legado`: modelo, codificador de estado, codificador de restaurante y, opcional,
+    el JSON de metadatos). Nunca se escriben: el primer entrenamiento crea el paquete.
+    """
+
+    def __init__(self, paquete_path: str, rutas_legado: Optional[Sequence[Optional[str]]] = None):
+        self.paquete_path = paquete_path
+        self.rutas_legado = tuple(rutas_legado or ())
+        self._lock = threading.Lock()
+        self._actual: Optional[ModeloCargado] = None
+
+    # ==========================
+    # 🔹 LECTURA
+    # ==========================
+    def obtener(self) -> Optional[ModeloCargado]:
+        """Retorna la instantánea vigente o None si el modelo aún no ha sido entrenado."""
+        version = self._version_en_disco()
+        if version is None:
+            return None
+
+        actual = self._actual
+        if actual is not None and actual.version == version:
+            return actual
+
+        with self._lock:
+            actual = self._actual
+            version = self._version_en_disco()
+            if version is None:
+                return None
+            if actual is not None and actual.version == version:
+                return actual
+
+            self._actual = self._cargar(version)
+            return self._actual
+
+    # ==========================
+    # 🔹 ESCRITURA
+    # ==========================
+    def publicar(
+        self,
+        modelo: Any,
+        encoder_estado: Any,
+        encoder_restaurante: Any,
+        metadatos: Optional[Dict[str, Any]] = None,
+    ) -> ModeloCargado:
+        """Guarda el paquete en disco y lo deja activo en memoria de inmediato."""
+        paquete = {
+            "modelo": modelo,
+            "encoder_estado": encoder_estado,
+            "encoder_restaurante": encoder_restaurante,
+            "metadatos": dict(metadatos or {}),
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.paquete_path) or ".", exist_ok=True)
+            temporal = f"{self.paquete_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            joblib.dump(paquete, temporal)
+            os.replace(temporal, self.paquete_path)
+
+            self._actual = ModeloCargado(version=self._version_en_disco() or (), **paquete)
+            return self._actual
+
+    # ==========================
+    # 🔹 UTILIDADES
+    # ==========================
+    def _cargar(self, version: Tuple[Tuple[int, int], ...]) -> ModeloCargado:
+        if os.path.exists(self.paquete_path):
+            # El archivo abierto no cambia aunque otro proceso publique mientras se lee
+            with open(self.paquete_path, "rb") as archivo:
+                version = (_firma(os.fstat(archivo.fileno())),)
+                paquete = joblib.load(archivo)
+            return ModeloCargado(version=version, **paquete)
+
+        modelo_path, estado_path, restaurante_path = self.rutas_legado[:3]
+        return ModeloCargado(
+            modelo=joblib.load(modelo_path),
+            encoder_estado=joblib.load(estado_path),
+            encoder_restaurante=joblib.load(restaurante_path),
+            version=version,
+            metadatos=self._leer_metadatos_legado(),
+        )
+
+    def _version_en_disco(self) -> Optional[Tuple[Tuple[int, int], ...]]:
+        try:
+            return (_firma(os.stat(self.paquete_path)),)
+        except FileNotFoundError:
+            pass
+        rutas = [ruta for ruta in self.rutas_legado if ruta]
+        if len(rutas) < 3:
+            return None
+        try:
+            return tuple(_firma(os.stat(ruta)) for ruta in rutas[:3])
+        except FileNotFoundError:
+            return None
+
+    def _leer_metadatos_legado(self) -> Dict[str, Any]:
+        ruta = self.rutas_legado[3] if len(self.rutas_legado) > 3 else None
+        if not ruta:
+            return {}
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+def _firma(estado: os.stat_result) -> Tuple[int, int]:
+    return estado.st_mtime_ns, estado.st_size
@@ -0,0 +1,71 @@
+"""Background delivery of notification emails with per-notification status tracking."""
+
+import asyncio
+import os
+import uuid
+from typing import Any, Dict, Optional
+
+from app.models.email import EmailRequest
+from app.services.email_outbox import EmailOutbox, email_outbox
+
+# Upper bound for one `deliver` call (each send has its own HTTP timeout as well)
+NOTIFICATION_DELIVERY_TIMEOUT = float(os.getenv("NOTIFICATION_DELIVERY_TIMEOUT", "15"))
+# Pending retries of other notifications sent per `deliver` when no outbox worker runs
+NOTIFICATION_RETRY_BATCH = int(os.getenv("NOTIFICATION_RETRY_BATCH", "5"))
+
+
+class NotificationDispatcher:
+    """Queue groups of emails in the outbox and report their delivery status.
+
+    `queue` only performs a local write (in a worker thread, off the event loop);
+    `deliver` (run as a background task) sends that notification's emails concurrently,
+    one attempt each and bounded by `delivery_timeout`. Emails that fail are retried by
+    the outbox with exponential backoff.
+
+    On AWS Lambda, Mangum runs background tasks before the invocation returns, so the
+    response waits for `deliver` (at most `delivery_timeout`), and no outbox worker runs
+    there. Each `deliver` therefore also sends a small batch (`retry_batch`) of other due
+    retries when the worker is not running.
+    """
+
+    def __init__(
+        self,
+        outbox: EmailOutbox = email_outbox,
+        *,
+        delivery_timeout: float = NOTIFICATION_DELIVERY_TIMEOUT,
+        retry_batch: int = NOTIFICATION_RETRY_BATCH,
+    ) -> None:
+        self.outbox = outbox
+        self.delivery_timeout = delivery_timeout
+        self.retry_batch = retry_batch
+
+    async def queue(self, emails: Dict[str, EmailRequest]) -> str:
+        """Persist the emails (keyed by recipient label, e.g. `customer`) and return the notification id."""
+        notification_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.outbox.enqueue_many, emails, group_id=notification_id)
+        return notification_id
+
+    async def deliver(self, notification_id: str) -> None:
+        """Send the emails of `notification_id` (plus a few pending retries if no worker runs)."""
+        try:
+            await asyncio.wait_for(self._deliver(notification_id), timeout=self.delivery_timeout)
+        except asyncio.TimeoutError:
+            # Claimed emails are picked up again once their lease expires.
+            print(f"Tiempo agotado enviando la notificación {notification_id}")
+        except Exception as exc:
+            # The outbox worker (or a later delivery) will pick the emails up.
+            print(f"Error enviando la notificación {notification_id}: {exc}")
+
+    async def _deliver(self, notification_id: str) -> None:
+        await self.outbox.drain(group_id=notification_id)
+        if not self.outbox.worker_running and self.retry_batch > 0:
+            await self.outbox.drain(limit=self.retry_batch)
+
+    async def status(self, notification_id: str) -> Optional[Dict[str, Any]]:
+        deliveries = await asyncio.to_thread(self.outbox.group_status, notification_id)
+        if deliveries is None:
+            return None
+        return {"notification_id": notification_id, "deliveries": deliveries}
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -2,15 +2,40 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
-from urllib import response
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import numpy as np
 import pandas as pd
+from postgrest.exceptions import APIError
 
-from app.services.supabase_service import SupabaseService
+from app.core.cache import TTLCache
+from app.core.executors import PROCESS_POOL_WORKERS, get_process_pool, get_thread_pool, reset_process_pool
+from app.core.frames import apply_schema, frame_memory
+from app.services.supabase_service import (
+    UNDEFINED_COLUMN_CODES,
+    AsyncSupabaseService,
+    SupabaseService,
+    rows_watermark,
+)
 
 
 SPANISH_WEEKDAYS = [
@@ -23,6 +48,82 @@ SPANISH_WEEKDAYS = [
     "Domingo",
 ]
 
+# Reservas próximas con mayor riesgo de cancelación a reportar
+CANCELLATION_TOP_K = 5
+
+# Columnas candidatas (se usa la primera que exista) para cada dato de una reservación
+CREATED_COLUMNS = ["created_at", "booking_date", "requested_at", "submitted_at"]
+CUSTOMER_ID_COLUMNS = ["customer_email", "customer_id", "customer_name", "user_id", "id_cliente"]
+AMOUNT_COLUMNS = ["total_amount", "amount", "total", "bill_amount", "ticket_amount"]
+CITY_COLUMNS = ["customer_city", "city", "customer_location", "province"]
+AVG_TICKET_KEYS = ["avg_ticket", "average_ticket", "ticket_average", "ticket_promedio"]
+CAPACITY_KEYS = ["capacity", "seating_capacity", "max_capacity", "tables"]
+
+# Únicas columnas que se piden a Supabase (las candidatas que no existan se omiten);
+# `updated_at` y `restaurant_id` se usan para la marca de agua y para separar lotes.
+RESERVATION_COLUMNS = [
+    "id",
+    "restaurant_id",
+    "reservation_date",
+    "reservation_time",
+    "guests_count",
+    "status",
+    "updated_at",
+    *CREATED_COLUMNS,
+    *CUSTOMER_ID_COLUMNS,
+    *AMOUNT_COLUMNS,
+    *CITY_COLUMNS,
+]
+RESTAURANT_COLUMNS = ["id", "name", *AVG_TICKET_KEYS, *CAPACITY_KEYS]
+
+# Una entrada por sección y restaurante (más el encabezado de la respuesta)
+INSIGHTS_CACHE_MAX_ENTRIES = 2048
+INSIGHTS_CACHE_TTL_SECONDS = 15 * 60
+INSIGHTS_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Columnas (y tipos) del DataFrame preparado que usan los indicadores; el resto se descarta.
+# Las agrupaciones sobre columnas `category` deben usar `observed=True`.
+PREPARED_SCHEMA = {
+    "id": "object",
+    "reservation_datetime": "datetime64[ns]",
+    "date_only": "datetime64[ns]",
+    "weekday": "int8",
+    "hour": "int8",
+    "guests_count": "int16",
+    "status": "category",
+    "is_cancelled": "bool",
+    "is_confirmed": "bool",
+    "lead_time_days": "float32",
+    "customer_label": "category",
+    "customer_city": "category",
+    "expected_revenue": "float32",
+}
+
+
+# Plan de cálculo: sección -> (método, insumos compartidos que recibe además del DataFrame).
+# Cada insumo se calcula una sola vez y solo si alguna de las secciones pedidas lo usa.
+SECTION_PLAN: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "demand_capacity": ("_demand_and_capacity", ("context", "cube")),
+    "cancellations": ("_cancellation_insights", ("months",)),
+    "timing_behavior": ("_timing_behavior", ("cube",)),
+    "economics": ("_economic_predictions", ("context", "cube")),
+    "segmentation": ("_segmentation", ("months",)),
+    "operations": ("_operational_alerts", ("context", "cube")),
+    "trend_seasonality": ("_trend_and_seasonality", ("cube",)),
+}
+INSIGHT_SECTIONS = tuple(SECTION_PLAN)
+SECTION_ALIASES = {"trend_and_seasonality": "trend_seasonality"}
+
+# Cómo se calculan las secciones: serial, threads, processes o auto (hilos; procesos para
+# restaurantes con al menos INSIGHTS_PROCESS_MIN_ROWS reservaciones)
+INSIGHTS_EXECUTOR = os.getenv("INSIGHTS_EXECUTOR", "auto")
+INSIGHTS_PROCESS_MIN_ROWS = int(os.getenv("INSIGHTS_PROCESS_MIN_ROWS", "250000"))
+EXECUTOR_MODES = ("serial", "threads", "processes")
+
+
+class UnknownSectionError(ValueError):
+    """Se pidió una sección de indicadores que no existe."""
+
 
 @dataclass
 class RestaurantContext:
@@ -31,67 +132,470 @@ class RestaurantContext:
     avg_ticket: float
 
 
+@dataclass(frozen=True)
+class AggregationCube:
+    """
+    Agregados de un restaurante calculados en una sola pasada sobre el DataFrame preparado.
+
+    `guests`, `counts` y `revenue` son matrices densas 7×24 (día de la semana × hora);
+    `daily_revenue` es el ingreso por fecha (en orden cronológico) y `hour_active_days`
+    cuántas fechas distintas tuvieron reservas en cada hora.
+    """
+
+    guests: np.ndarray
+    counts: np.ndarray
+    revenue: np.ndarray
+    daily_revenue: np.ndarray
+    hour_active_days: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "AggregationCube":
+        slot = df["weekday"].to_numpy(dtype=np.intp) * 24 + df["hour"].to_numpy(dtype=np.intp)
+        guests = df["guests_count"].to_numpy(dtype=float)
+        revenue = df["expected_revenue"].to_numpy(dtype=float)
+
+        date_codes, dates = pd.factorize(df["date_only"], sort=True)
+        daily_revenue = np.bincount(date_codes, weights=revenue, minlength=len(dates))
+        date_hour = np.bincount(
+            date_codes * 24 + df["hour"].to_numpy(dtype=np.intp), minlength=len(dates) * 24
+        ).reshape(len(dates), 24)
+
+        return cls(
+            guests=np.bincount(slot, weights=guests, minlength=7 * 24).reshape(7, 24),
+            counts=np.bincount(slot, minlength=7 * 24).reshape(7, 24),
+            revenue=np.bincount(slot, weights=revenue, minlength=7 * 24).reshape(7, 24),
+            daily_revenue=daily_revenue,
+            hour_active_days=(date_hour > 0).sum(axis=0),
+        )
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+
 class RestaurantAIInsightsService:
     """Centraliza la lógica para construir insights predictivos por restaurante."""
 
-    def __init__(self, supabase_service: SupabaseService) -> None:
+    def __init__(
+        self,
+        supabase_service: SupabaseService,
+        async_supabase: Optional[AsyncSupabaseService] = None,
+    ) -> None:
         self.supabase = supabase_service
+        self.async_supabase = async_supabase
+        # Insights por (restaurante, marca de agua de sus reservaciones): los dashboards que
+        # consultan seguido reciben la respuesta guardada mientras no cambien los datos.
+        self._cache = TTLCache(
+            maxsize=INSIGHTS_CACHE_MAX_ENTRIES,
+            ttl=INSIGHTS_CACHE_TTL_SECONDS,
+            max_bytes=INSIGHTS_CACHE_MAX_BYTES,
+        )
 
     # ------------------------------------------------------------------
     # Público
     # ------------------------------------------------------------------
-    def generate_insights(self, restaurant_id: str) -> Dict[str, Any]:
-        df = self._fetch_reservations(restaurant_id)
-        if df.empty:
+    @staticmethod
+    def resolve_sections(sections: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+        """Normaliza las secciones pedidas (todas si no se indica ninguna) en el orden canónico."""
+        if not sections:
+            return INSIGHT_SECTIONS
+
+        requested = {SECTION_ALIASES.get(section, section) for section in sections}
+        unknown = requested - set(INSIGHT_SECTIONS)
+        if unknown:
+            raise UnknownSectionError(
+                f"Secciones desconocidas: {', '.join(sorted(unknown))}. "
+                f"Disponibles: {', '.join(INSIGHT_SECTIONS)}"
+            )
+        return tuple(section for section in INSIGHT_SECTIONS if section in requested)
+
+    def generate_insights(self, restaurant_id: str, sections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        sections = self.resolve_sections(sections)
+        watermark = self.supabase.get_reservations_watermark(restaurant_id)
+        header, cached = self._lookup_cache(restaurant_id, watermark, sections)
+        missing = [section for section in sections if section not in cached]
+        if header is not None and not missing:
+            return self._assemble(header, cached, sections)
+
+        # El restaurante no depende de las reservaciones: se consulta en paralelo
+        restaurant_future = get_thread_pool().submit(self._fetch_restaurant, restaurant_id)
+        rows = self._fetch_reservations(restaurant_id)
+        restaurant = restaurant_future.result()
+        if not rows:
             raise ValueError("No hay reservaciones registradas para este restaurante")
 
-        context = self._build_restaurant_context(df, restaurant_id)
+        insights = self._build_insights(restaurant_id, rows, restaurant, missing)
+        self._store_cache(restaurant_id, watermark, insights)
+        return self._assemble(insights, {**cached, **insights["indicators"]}, sections)
+
+    async def agenerate_insights(
+        self, restaurant_id: str, sections: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """Versión asíncrona: consulta con el cliente async y calcula con pandas en un hilo aparte."""
+        if self.async_supabase is None:
+            return await asyncio.to_thread(self.generate_insights, restaurant_id, sections)
+
+        sections = self.resolve_sections(sections)
+        watermark = await self.async_supabase.get_reservations_watermark(restaurant_id)
+        header, cached = self._lookup_cache(restaurant_id, watermark, sections)
+        missing = [section for section in sections if section not in cached]
+        if header is not None and not missing:
+            return self._assemble(header, cached, sections)
+
+        rows, restaurant = await asyncio.gather(
+            self._afetch_reservations(restaurant_id), self._afetch_restaurant(restaurant_id)
+        )
+        if not rows:
+            raise ValueError("No hay reservaciones registradas para este restaurante")
+
+        insights = await asyncio.to_thread(self._build_insights, restaurant_id, rows, restaurant, missing)
+        self._store_cache(restaurant_id, watermark, insights)
+        return self._assemble(insights, {**cached, **insights["indicators"]}, sections)
+
+    async def aload_batch(
+        self, restaurant_ids: Sequence[str]
+    ) -> Dict[str, Tuple[pd.DataFrame, Dict[str, Any]]]:
+        """
+        Lee las reservaciones de varios restaurantes con una sola consulta `in_()` (paginada)
+        y sus filas de `restaurants` con otra; retorna las reservaciones y el restaurante de
+        cada id, separados con un `groupby` sobre `restaurant_id`.
+        """
+        restaurant_ids = list(dict.fromkeys(restaurant_ids))
+        rows, restaurants = await asyncio.gather(
+            self._afetch_batch_reservations(restaurant_ids),
+            self._afetch_batch_restaurants(restaurant_ids),
+        )
+
+        frame = self._reservations_frame(rows)
+        groups = dict(tuple(frame.groupby("restaurant_id", sort=False))) if not frame.empty else {}
+        by_id = {str(restaurant.get("id")): restaurant for restaurant in restaurants}
+        return {
+            restaurant_id: (groups.get(restaurant_id, frame.iloc[0:0]), by_id.get(restaurant_id, {}))
+            for restaurant_id in restaurant_ids
+        }
+
+    async def astream_batch_insights(
+        self,
+        batch: Dict[str, Tuple[pd.DataFrame, Dict[str, Any]]],
+        sections: Optional[Iterable[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Produce los insights de cada restaurante de `aload_batch` apenas están listos: primero
+        los que ya estaban en caché y luego los calculados en el pool de procesos, en orden de
+        término. Los restaurantes que fallan producen `{"restaurant_id", "error"}`.
+        """
+        sections = self.resolve_sections(sections)
+        pool = get_process_pool()
+        pending: Dict["asyncio.Future[Dict[str, Any]]", Tuple[str, Hashable, Dict[str, Any]]] = {}
+        try:
+            for restaurant_id, (reservations, restaurant) in batch.items():
+                if reservations.empty:
+                    yield {
+                        "restaurant_id": restaurant_id,
+                        "error": "No hay reservaciones registradas para este restaurante",
+                    }
+                    continue
+
+                # Misma clave que la consulta individual, calculada sin ir de nuevo a Supabase
+                watermark = rows_watermark(reservations)
+                header, cached = self._lookup_cache(restaurant_id, watermark, sections)
+                missing = [section for section in sections if section not in cached]
+                if header is not None and not missing:
+                    yield self._assemble(header, cached, sections)
+                    continue
+
+                future = asyncio.wrap_future(
+                    pool.submit(_build_insights_worker, restaurant_id, reservations, restaurant, missing)
+                )
+                pending[future] = (restaurant_id, watermark, cached)
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    restaurant_id, watermark, cached = pending.pop(future)
+                    try:
+                        insights = future.result()
+                    except Exception as exc:
+                        if isinstance(exc, BrokenProcessPool):
+                            reset_process_pool()
+                        yield {"restaurant_id": restaurant_id, "error": f"Error generando insights: {exc}"}
+                        continue
+
+                    self._store_cache(restaurant_id, watermark, insights)
+                    yield self._assemble(insights, {**cached, **insights["indicators"]}, sections)
+        finally:
+            # El cliente se desconectó o hubo un error: no calcular lo que nadie va a leer
+            for future in pending:
+                future.cancel()
+
+    def _build_insights(
+        self,
+        restaurant_id: str,
+        rows: List[Dict[str, Any]],
+        restaurant: Dict[str, Any],
+        sections: Iterable[str] = INSIGHT_SECTIONS,
+        executor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return self._insights_from_frame(
+            restaurant_id, self._reservations_frame(rows), restaurant, sections, executor
+        )
+
+    def _insights_from_frame(
+        self,
+        restaurant_id: str,
+        df: pd.DataFrame,
+        restaurant: Dict[str, Any],
+        sections: Iterable[str] = INSIGHT_SECTIONS,
+        executor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        context = self._build_restaurant_context(df, restaurant)
         prepared = self._prepare_dataframe(df, context.avg_ticket)
+        sections = list(sections)
+        inputs = self._section_inputs(prepared, context, sections)
+
+        mode = self._executor_mode(executor or INSIGHTS_EXECUTOR, len(prepared), len(sections))
+        results, mode = self._compute_sections(sections, prepared, inputs, mode)
 
         return {
             "restaurant_id": restaurant_id,
             "restaurant_name": context.restaurant.get("name"),
             "generated_at": datetime.utcnow().isoformat(),
-            "indicators": {
-                "demand_capacity": self._demand_and_capacity(prepared, context),
-                "cancellations": self._cancellation_insights(prepared),
-                "timing_behavior": self._timing_behavior(prepared),
-                "economics": self._economic_predictions(prepared, context),
-                "segmentation": self._segmentation(prepared),
-                "operations": self._operational_alerts(prepared, context),
-                "trend_seasonality": self._trend_and_seasonality(prepared),
+            "data_profile": frame_memory(prepared),
+            "compute": {
+                "executor": mode,
+                "sections_ms": {section: results[section][1] for section in sections},
             },
+            "indicators": {section: results[section][0] for section in sections},
         }
 
+    def _section_inputs(
+        self, df: pd.DataFrame, context: RestaurantContext, sections: Iterable[str]
+    ) -> Dict[str, Any]:
+        """Calcula los insumos compartidos que usan las secciones pedidas."""
+        needed = {name for section in sections for name in SECTION_PLAN[section][1]}
+        builders = {
+            "context": lambda: context,
+            "months": lambda: df["reservation_datetime"].dt.to_period("M").rename("month"),
+            "cube": lambda: AggregationCube.from_frame(df),
+        }
+        return {name: builders[name]() for name in needed}
+
+    # ------------------------------------------------------------------
+    # Ejecución de secciones
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _executor_mode(requested: str, rows: int, sections: int) -> str:
+        if requested in EXECUTOR_MODES:
+            return requested
+        if sections <= 1:
+            return "serial"
+        return "processes" if rows >= INSIGHTS_PROCESS_MIN_ROWS else "threads"
+
+    def _compute_sections(
+        self, sections: List[str], df: pd.DataFrame, inputs: Dict[str, Any], mode: str
+    ) -> Tuple[Dict[str, Tuple[Any, float]], str]:
+        """
+        Calcula las secciones (independientes entre sí) y el tiempo de cada una en ms.
+
+        En modo `processes` el DataFrame se envía una vez por grupo de secciones, no una
+        vez por sección. Retorna también el modo usado realmente.
+        """
+        if mode == "serial":
+            return self._run_sections(sections, df, inputs), mode
+
+        pool = get_process_pool() if mode == "processes" else None
+        if isinstance(pool, ProcessPoolExecutor):
+            groups = [sections[i::PROCESS_POOL_WORKERS] for i in range(min(PROCESS_POOL_WORKERS, len(sections)))]
+            try:
+                futures = [pool.submit(_run_sections_worker, group, df, inputs) for group in groups]
+                results: Dict[str, Tuple[Any, float]] = {}
+                for future in futures:
+                    results.update(future.result())
+                return results, "processes"
+            except BrokenProcessPool:
+                # Un worker murió (p. ej. sin memoria): descartar el pool y seguir con hilos
+                reset_process_pool()
+
+        pool = get_thread_pool()
+        pending = [pool.submit(self._run_sections, [section], df, inputs) for section in sections]
+        results = {}
+        for future in pending:
+            results.update(future.result())
+        return results, "threads"
+
+    def _run_sections(
+        self, sections: Iterable[str], df: pd.DataFrame, inputs: Dict[str, Any]
+    ) -> Dict[str, Tuple[Any, float]]:
+        results: Dict[str, Tuple[Any, float]] = {}
+        for section in sections:
+            method, needs = SECTION_PLAN[section]
+            started = time.perf_counter()
+            value = getattr(self, method)(df, **{name: inputs[name] for name in needs})
+            results[section] = (value, round((time.perf_counter() - started) * 1000, 2))
+        return results
+
+    # ------------------------------------------------------------------
+    # Caché por sección
+    # ------------------------------------------------------------------
+    def _lookup_cache(
+        self, restaurant_id: str, watermark: Hashable, sections: Iterable[str]
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """Encabezado y secciones ya calculadas para esta marca de agua de las reservaciones."""
+        header = self._cache.get((restaurant_id, watermark, None))
+        if header is None:
+            return None, {}
+
+        cached: Dict[str, Any] = {}
+        for section in sections:
+            value = self._cache.get((restaurant_id, watermark, section))
+            if value is not None:
+                cached[section] = value
+        return header, cached
+
+    def _store_cache(self, restaurant_id: str, watermark: Hashable, insights: Dict[str, Any]) -> None:
+        # Los tiempos de cálculo solo describen la petición que calculó las secciones
+        header = {key: value for key, value in insights.items() if key not in ("indicators", "compute")}
+        self._cache.set((restaurant_id, watermark, None), header)
+        for section, value in insights["indicators"].items():
+            self._cache.set((restaurant_id, watermark, section), value)
+
+    @staticmethod
+    def _assemble(header: Dict[str, Any], indicators: Dict[str, Any], sections: Iterable[str]) -> Dict[str, Any]:
+        response = {key: value for key, value in header.items() if key != "indicators"}
+        # Misma forma con o sin cálculo: si todo salió de la caché no hubo secciones calculadas
+        response.setdefault("compute", {"executor": "cache", "sections_ms": {}})
+        response["indicators"] = {section: indicators[section] for section in sections}
+        return response
+
     # ------------------------------------------------------------------
     # Carga y preparación de datos
     # ------------------------------------------------------------------
-    def _fetch_reservations(self, restaurant_id: str) -> pd.DataFrame:
-       response = (
-            self.supabase.client.table("reservations")
-            .select("*")
-            .eq("restaurant_id", restaurant_id)
-           .execute()
-       )
-       data = response.data or []
-       df = pd.DataFrame(data)
-
-       # 🔧 Versión global: eliminar zona horaria de todas las columnas datetime
-       for col in df.select_dtypes(include=["datetimetz"]).columns:
-        df[col] = df[col].dt.tz_convert(None)
-
-       return df
-
-
-    def _build_restaurant_context(self, df: pd.DataFrame, restaurant_id: str) -> RestaurantContext:
-        restaurant = (
-            self.supabase.client.table("restaurants")
-            .select("*")
-            .eq("id", restaurant_id)
-            .single()
-            .execute()
-        ).data or {}
+    def _fetch_reservations(self, restaurant_id: str) -> List[Dict[str, Any]]:
+        where = self._restaurant_filter(restaurant_id)
+        return self._projected(
+            "reservations",
+            RESERVATION_COLUMNS,
+            lambda columns: self.supabase.get_reservations(columns, where=where),
+        )
+
+    def _fetch_restaurant(self, restaurant_id: str) -> Dict[str, Any]:
+        # `limit(1)` y no `single()`: un id inexistente no debe fallar antes de que se
+        # revisen las reservaciones (consulta en paralelo), que lo reportan como 404
+        return self._projected(
+            "restaurants",
+            RESTAURANT_COLUMNS,
+            lambda columns: _first(
+                self.supabase.client.table("restaurants")
+                .select(_select(columns))
+                .eq("id", restaurant_id)
+                .limit(1)
+                .execute()
+            ),
+        )
+
+    async def _afetch_reservations(self, restaurant_id: str) -> List[Dict[str, Any]]:
+        where = self._restaurant_filter(restaurant_id)
+        return await self._aprojected(
+            "reservations",
+            RESERVATION_COLUMNS,
+            lambda columns: self.async_supabase.get_reservations(columns, where=where),
+        )
 
+    async def _afetch_restaurant(self, restaurant_id: str) -> Dict[str, Any]:
+        async def fetch(columns: Optional[List[str]]) -> Dict[str, Any]:
+            return _first(
+                await self.async_supabase.client.table("restaurants")
+                .select(_select(columns))
+                .eq("id", restaurant_id)
+                .limit(1)
+                .execute()
+            )
+
+        return await self._aprojected("restaurants", RESTAURANT_COLUMNS, fetch)
+
+    async def _afetch_batch_reservations(self, restaurant_ids: List[str]) -> List[Dict[str, Any]]:
+        where = self._restaurants_filter(restaurant_ids)
+        if self.async_supabase is None:
+            return await asyncio.to_thread(
+                self._projected,
+                "reservations",
+                RESERVATION_COLUMNS,
+                lambda columns: self.supabase.get_reservations(columns, where=where),
+            )
+        return await self._aprojected(
+            "reservations",
+            RESERVATION_COLUMNS,
+            lambda columns: self.async_supabase.get_reservations(columns, where=where),
+        )
+
+    async def _afetch_batch_restaurants(self, restaurant_ids: List[str]) -> List[Dict[str, Any]]:
+        if self.async_supabase is None:
+            return await asyncio.to_thread(
+                self._projected,
+                "restaurants",
+                RESTAURANT_COLUMNS,
+                lambda columns: (
+                    self.supabase.client.table("restaurants")
+                    .select(_select(columns))
+                    .in_("id", restaurant_ids)
+                    .execute()
+                ).data
+                or [],
+            )
+
+        async def fetch(columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+            return (
+                await self.async_supabase.client.table("restaurants")
+                .select(_select(columns))
+                .in_("id", restaurant_ids)
+                .execute()
+            ).data or []
+
+        return await self._aprojected("restaurants", RESTAURANT_COLUMNS, fetch)
+
+    def _projected(self, table: str, candidates: List[str], fetch: Callable[[Optional[List[str]]], Any]) -> Any:
+        """Ejecuta `fetch(columnas)` pidiendo solo las columnas candidatas que existen en `table`."""
+        columns = self.supabase.available_columns(table, candidates)
+        try:
+            return fetch(columns)
+        except APIError as exc:
+            if columns is None or exc.code not in UNDEFINED_COLUMN_CODES:
+                raise
+            # El esquema cambió desde el sondeo: pedir todas y volver a sondear la próxima vez
+            self.supabase.forget_columns(table)
+            return fetch(None)
+
+    async def _aprojected(
+        self, table: str, candidates: List[str], fetch: Callable[[Optional[List[str]]], Awaitable[Any]]
+    ) -> Any:
+        """Igual que `_projected`, con el cliente asíncrono."""
+        columns = await self.async_supabase.available_columns(table, candidates)
+        try:
+            return await fetch(columns)
+        except APIError as exc:
+            if columns is None or exc.code not in UNDEFINED_COLUMN_CODES:
+                raise
+            self.async_supabase.forget_columns(table)
+            return await fetch(None)
+
+    @staticmethod
+    def _restaurant_filter(restaurant_id: str):
+        return lambda query: query.eq("restaurant_id", restaurant_id)
+
+    @staticmethod
+    def _restaurants_filter(restaurant_ids: List[str]):
+        return lambda query: query.in_("restaurant_id", restaurant_ids)
+
+    def _reservations_frame(self, rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        df = pd.DataFrame(rows)
+
+        # 🔧 Versión global: eliminar zona horaria de todas las columnas datetime
+        for col in df.select_dtypes(include=["datetimetz"]).columns:
+            df[col] = df[col].dt.tz_convert(None)
+
+        return df
+
+    def _build_restaurant_context(self, df: pd.DataFrame, restaurant: Dict[str, Any]) -> RestaurantContext:
         # 🔧 Si algún campo del restaurante llega como tz-aware datetime, limpiarlo
         if isinstance(restaurant, dict):
             for key, value in restaurant.items():
@@ -103,8 +607,6 @@ class RestaurantAIInsightsService:
 
         return RestaurantContext(restaurant=restaurant, capacity=capacity, avg_ticket=avg_ticket)
 
-
-
     def _prepare_dataframe(self, df: pd.DataFrame, avg_ticket: float) -> pd.DataFrame:
         work = df.copy()
 
@@ -123,7 +625,7 @@ class RestaurantAIInsightsService:
 
         work["weekday"] = work["reservation_datetime"].dt.weekday
         work["hour"] = work["reservation_datetime"].dt.hour
-        work["date_only"] = work["reservation_datetime"].dt.date
+        work["date_only"] = work["reservation_datetime"].dt.normalize()
 
         guests = pd.to_numeric(work.get("guests_count"), errors="coerce")
         work["guests_count"] = guests.fillna(2).clip(lower=1).astype(int)
@@ -132,10 +634,7 @@ class RestaurantAIInsightsService:
         work["is_cancelled"] = work["status"].isin(["cancelled", "canceled"])
         work["is_confirmed"] = work["status"].isin(["confirmed", "completed"])
 
-        created_col = self._first_available_column(
-            work,
-            ["created_at", "booking_date", "requested_at", "submitted_at"],
-        )
+        created_col = self._first_available_column(work, CREATED_COLUMNS)
         created_series = pd.to_datetime(work[created_col], errors="coerce") if created_col else None
 
         fallback_lead = np.where(work["status"] == "pending", 1.5, 2.8)
@@ -154,37 +653,31 @@ class RestaurantAIInsightsService:
         )
         work["lead_time_days"] = work["lead_time_days"].fillna(median_lead).clip(lower=0)
 
-        id_col = self._first_available_column(
-            work,
-            ["customer_email", "customer_id", "customer_name", "user_id", "id_cliente"],
-        )
+        id_col = self._first_available_column(work, CUSTOMER_ID_COLUMNS)
         work["customer_label"] = work[id_col].astype(str) if id_col else "Cliente"
 
-        amount_col = self._first_available_column(
-            work,
-            ["total_amount", "amount", "total", "bill_amount", "ticket_amount"],
-        )
+        amount_col = self._first_available_column(work, AMOUNT_COLUMNS)
         if amount_col:
             amounts = pd.to_numeric(work[amount_col], errors="coerce")
             work["expected_revenue"] = amounts.fillna(work["guests_count"] * avg_ticket)
         else:
             work["expected_revenue"] = work["guests_count"] * avg_ticket
 
-        city_col = self._first_available_column(
-            work,
-            ["customer_city", "city", "customer_location", "province"],
-        )
+        city_col = self._first_available_column(work, CITY_COLUMNS)
         work["customer_city"] = work[city_col].fillna("Sin dato") if city_col else "Sin dato"
 
-        return work
+        return apply_schema(work, PREPARED_SCHEMA)
 
     # ------------------------------------------------------------------
     # Demanda y capacidad
     # ------------------------------------------------------------------
-    def _demand_and_capacity(self, df: pd.DataFrame, context: RestaurantContext) -> Dict[str, Any]:
+    def _demand_and_capacity(
+        self, df: pd.DataFrame, context: RestaurantContext, cube: Optional[AggregationCube] = None
+    ) -> Dict[str, Any]:
+        cube = cube if cube is not None else AggregationCube.from_frame(df)
         peak_info = self._predict_next_peak(df, context.capacity)
-        hourly = self._hourly_occupancy(df, context.capacity)
-        weekday = self._weekday_demand(df)
+        hourly = self._hourly_occupancy(cube, context.capacity)
+        weekday = self._weekday_demand(cube)
 
         return {
             "next_peak": peak_info,
@@ -222,16 +715,19 @@ class RestaurantAIInsightsService:
             ),
         }
 
-    def _hourly_occupancy(self, df: pd.DataFrame, capacity: int) -> List[Dict[str, Any]]:
-        if df.empty:
+    def _hourly_occupancy(self, cube: AggregationCube, capacity: int) -> List[Dict[str, Any]]:
+        if not cube.total:
             return []
 
-        hour_daily = df.groupby(["date_only", "hour"])["guests_count"].sum().reset_index()
-        hourly_mean = hour_daily.groupby("hour")["guests_count"].mean()
+        # Promedio de comensales por hora en las fechas que tuvieron reservas a esa hora
+        hour_guests = cube.guests.sum(axis=0)
+        hourly_mean = np.divide(
+            hour_guests, cube.hour_active_days, out=np.zeros(24), where=cube.hour_active_days > 0
+        )
 
         results: List[Dict[str, Any]] = []
         for hour in range(0, 24):
-            guests = float(hourly_mean.get(hour, 0.0))
+            guests = float(hourly_mean[hour])
             occupancy = min(1.0, guests / max(capacity, 1))
             results.append(
                 {
@@ -242,11 +738,11 @@ class RestaurantAIInsightsService:
             )
         return results
 
-    def _weekday_demand(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        weekday_counts = df.groupby("weekday")["guests_count"].sum().reindex(range(7), fill_value=0)
+    def _weekday_demand(self, cube: AggregationCube) -> List[Dict[str, Any]]:
+        weekday_counts = cube.guests.sum(axis=1)
         average = weekday_counts.mean() or 1
         insights: List[Dict[str, Any]] = []
-        for idx, value in weekday_counts.items():
+        for idx, value in enumerate(weekday_counts):
             delta = (value / average) - 1
             insights.append(
                 {
@@ -260,32 +756,47 @@ class RestaurantAIInsightsService:
     # ------------------------------------------------------------------
     # Cancelaciones y fidelidad
     # ------------------------------------------------------------------
-    def _cancellation_insights(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _cancellation_insights(self, df: pd.DataFrame, months: Optional[pd.Series] = None) -> Dict[str, Any]:
         baseline = float(df["is_cancelled"].mean() or 0.05)
-        customer_ratio = df.groupby("customer_label")["is_cancelled"].mean()
+        customer_ratio = df.groupby("customer_label", observed=True)["is_cancelled"].mean()
 
-        focus_df = df[df["reservation_datetime"] >= datetime.utcnow()].copy()
+        focus_df = df[df["reservation_datetime"] >= datetime.utcnow()]
         if focus_df.empty:
-            focus_df = df.sort_values("reservation_datetime", ascending=False).head(5)
+            focus_df = df.nlargest(CANCELLATION_TOP_K, "reservation_datetime")
 
-        reservation_risk: List[Dict[str, Any]] = []
-        for _, row in focus_df.head(5).iterrows():
-            history = float(customer_ratio.get(row["customer_label"], baseline))
-            lead_factor = 0.2 if row["lead_time_days"] < 1 else (-0.05 if row["lead_time_days"] > 5 else 0.0)
-            size_factor = -0.05 if row["guests_count"] >= 6 else 0.05
-            status_factor = 0.1 if row["status"] == "pending" else 0.0
+        # Probabilidad para todas las reservas próximas a la vez
+        lead = focus_df["lead_time_days"].to_numpy()
+        # `object`: mapear un categórico da otro categórico, que no admite `baseline` en `fillna`
+        history = (
+            focus_df["customer_label"].astype(object).map(customer_ratio).fillna(baseline).to_numpy(dtype=float)
+        )
+        lead_factor = np.select([lead < 1, lead > 5], [0.2, -0.05], default=0.0)
+        size_factor = np.where(focus_df["guests_count"].to_numpy() >= 6, -0.05, 0.05)
+        status_factor = np.where(focus_df["status"].to_numpy() == "pending", 0.1, 0.0)
+        probability = np.clip(
+            baseline * 0.4 + history * 0.4 + lead_factor + size_factor + status_factor, 0.05, 0.95
+        )
 
-            probability = baseline * 0.4 + history * 0.4 + lead_factor + size_factor + status_factor
-            probability = float(np.clip(probability, 0.05, 0.95))
+        # Top-k por riesgo sin ordenar todo el arreglo
+        k = min(CANCELLATION_TOP_K, len(probability))
+        top = np.argpartition(-probability, k - 1)[:k] if k else np.array([], dtype=int)
+        top = top[np.argsort(-probability[top], kind="stable")]
 
-            reservation_risk.append(
-                {
-                    "reservation_id": row.get("id"),
-                    "customer": row.get("customer_label"),
-                    "scheduled_for": row["reservation_datetime"].isoformat(),
-                    "probability": round(probability, 2),
-                }
+        ids = focus_df["id"].to_numpy()[top].tolist() if "id" in focus_df.columns else [None] * k
+        reservation_risk: List[Dict[str, Any]] = [
+            {
+                "reservation_id": reservation_id,
+                "customer": customer,
+                "scheduled_for": scheduled.isoformat(),
+                "probability": round(float(prob), 2),
+            }
+            for reservation_id, customer, scheduled, prob in zip(
+                ids,
+                focus_df["customer_label"].to_numpy()[top].tolist(),
+                focus_df["reservation_datetime"].iloc[top],
+                probability[top],
             )
+        ]
 
         high_risk_users_series = customer_ratio[customer_ratio >= baseline + 0.1]
         high_risk_list = [
@@ -296,7 +807,7 @@ class RestaurantAIInsightsService:
             for idx, value in high_risk_users_series.sort_values(ascending=False).head(5).items()
         ]
 
-        loyal_forecast = self._loyal_customers_forecast(df)
+        loyal_forecast = self._loyal_customers_forecast(df, months)
 
         return {
             "cancellation_risk_by_reservation": reservation_risk,
@@ -304,10 +815,10 @@ class RestaurantAIInsightsService:
             "loyal_customers_forecast": loyal_forecast,
         }
 
-    def _loyal_customers_forecast(self, df: pd.DataFrame) -> Dict[str, Any]:
-        df = df.copy()
-        df["month"] = df["reservation_datetime"].dt.to_period("M")
-        repeats = df.groupby(["month", "customer_label"]).size().reset_index(name="reservations")
+    def _loyal_customers_forecast(self, df: pd.DataFrame, months: Optional[pd.Series] = None) -> Dict[str, Any]:
+        if months is None:
+            months = df["reservation_datetime"].dt.to_period("M").rename("month")
+        repeats = df.groupby([months, "customer_label"], observed=True).size().reset_index(name="reservations")
         loyal = repeats[repeats["reservations"] >= 2]
         monthly_loyal = loyal.groupby("month")["customer_label"].nunique().sort_index()
 
@@ -343,7 +854,8 @@ class RestaurantAIInsightsService:
     # ------------------------------------------------------------------
     # Timing
     # ------------------------------------------------------------------
-    def _timing_behavior(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _timing_behavior(self, df: pd.DataFrame, cube: Optional[AggregationCube] = None) -> Dict[str, Any]:
+        cube = cube if cube is not None else AggregationCube.from_frame(df)
         avg_lead = float(df["lead_time_days"].mean()) if not df.empty else 0.0
 
         recent_cut = datetime.utcnow() - timedelta(days=30)
@@ -352,15 +864,16 @@ class RestaurantAIInsightsService:
 
         trend = 0.0
         if not recent.empty and not previous.empty and previous["lead_time_days"].mean() > 0:
-            trend = ((recent["lead_time_days"].mean() - previous["lead_time_days"].mean()) / previous["lead_time_days"].mean()) * 100
+            trend = float(((recent["lead_time_days"].mean() - previous["lead_time_days"].mean()) / previous["lead_time_days"].mean()) * 100)
 
-        windows = df.groupby("hour").size().sort_values(ascending=False).head(3)
+        hour_counts = cube.counts.sum(axis=0)
+        windows = [hour for hour in np.argsort(-hour_counts, kind="stable")[:3] if hour_counts[hour]]
         windows_list = [
             {
                 "hour": f"{int(hour):02d}:00",
-                "percentage": round((count / df.shape[0]) * 100, 1),
+                "percentage": round((int(hour_counts[hour]) / cube.total) * 100, 1),
             }
-            for hour, count in windows.items()
+            for hour in windows
         ]
 
         return {
@@ -372,13 +885,16 @@ class RestaurantAIInsightsService:
     # ------------------------------------------------------------------
     # Economía
     # ------------------------------------------------------------------
-    def _economic_predictions(self, df: pd.DataFrame, context: RestaurantContext) -> Dict[str, Any]:
+    def _economic_predictions(
+        self, df: pd.DataFrame, context: RestaurantContext, cube: Optional[AggregationCube] = None
+    ) -> Dict[str, Any]:
+        cube = cube if cube is not None else AggregationCube.from_frame(df)
         today = datetime.utcnow().date()
-        weekday_multipliers = self._weekday_multiplier(df)
+        weekday_multipliers = self._weekday_multiplier(cube)
 
-        daily_series = df.groupby("date_only")["expected_revenue"].sum().sort_index()
-        base_daily = daily_series.tail(7).mean() if not daily_series.empty else df["expected_revenue"].mean()
-        base_daily = base_daily or (context.avg_ticket * 10)
+        daily_revenue = cube.daily_revenue
+        base_daily = daily_revenue[-7:].mean() if daily_revenue.size else df["expected_revenue"].mean()
+        base_daily = float(base_daily or (context.avg_ticket * 10))
 
         revenue_forecast: List[Dict[str, Any]] = []
         for offset in range(7):
@@ -391,7 +907,7 @@ class RestaurantAIInsightsService:
                 }
             )
 
-        ticket_avg = df["expected_revenue"].sum() / max(df["guests_count"].sum(), 1)
+        ticket_avg = float(df["expected_revenue"].to_numpy().sum(dtype=float)) / max(int(df["guests_count"].sum()), 1)
         cancellation_impact = self._estimate_cancellation_impact(df)
 
         return {
@@ -417,12 +933,12 @@ class RestaurantAIInsightsService:
     # ------------------------------------------------------------------
     # Segmentación
     # ------------------------------------------------------------------
-    def _segmentation(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _segmentation(self, df: pd.DataFrame, months: Optional[pd.Series] = None) -> Dict[str, Any]:
         planificadores = df[df["lead_time_days"] >= 3]
         espontaneos = df[df["lead_time_days"] < 1]
 
         count_col = "id" if "id" in df.columns else "reservation_datetime"
-        customer_status = df.groupby("customer_label").agg(
+        customer_status = df.groupby("customer_label", observed=True).agg(
             total=(count_col, "count"),
             cancellations=("is_cancelled", "sum"),
         )
@@ -430,7 +946,7 @@ class RestaurantAIInsightsService:
             (customer_status["total"] >= 3) & (customer_status["cancellations"] == 0)
         ]
 
-        city_growth = self._city_growth(df)
+        city_growth = self._city_growth(df, months)
 
         return {
             "customer_segments": {
@@ -441,13 +957,13 @@ class RestaurantAIInsightsService:
             "city_growth": city_growth,
         }
 
-    def _city_growth(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _city_growth(self, df: pd.DataFrame, months: Optional[pd.Series] = None) -> List[Dict[str, Any]]:
         if "customer_city" not in df.columns or df["customer_city"].nunique() <= 1:
             return []
 
-        df = df.copy()
-        df["month"] = df["reservation_datetime"].dt.to_period("M")
-        city_month = df.groupby(["customer_city", "month"]).size().reset_index(name="reservations")
+        if months is None:
+            months = df["reservation_datetime"].dt.to_period("M").rename("month")
+        city_month = df.groupby(["customer_city", months], observed=True).size().reset_index(name="reservations")
 
         latest_month = city_month["month"].max()
         prev_month = latest_month - 1 if latest_month else None
@@ -460,46 +976,49 @@ class RestaurantAIInsightsService:
         merged = latest.merge(prev, on="customer_city", how="left", suffixes=("_latest", "_prev"))
         merged["reservations_prev"] = merged["reservations_prev"].fillna(0)
 
-        def _growth(row: pd.Series) -> float:
-            prev_value = row["reservations_prev"]
-            if prev_value == 0:
-                return 100.0
-            return ((row["reservations_latest"] - prev_value) / prev_value) * 100
-
-        merged["growth"] = merged.apply(_growth, axis=1)
-        merged = merged.sort_values("growth", ascending=False).head(3)
+        prev_values = merged["reservations_prev"].to_numpy(dtype=float)
+        latest_values = merged["reservations_latest"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            merged["growth"] = np.where(
+                prev_values == 0, 100.0, (latest_values - prev_values) / prev_values * 100
+            )
+        merged = merged.nlargest(3, "growth")
 
         return [
-            {"city": row["customer_city"], "growth_pct": round(row["growth"], 1)}
-            for _, row in merged.iterrows()
+            {"city": city, "growth_pct": round(float(growth), 1)}
+            for city, growth in zip(merged["customer_city"], merged["growth"])
         ]
 
     # ------------------------------------------------------------------
     # Operaciones
     # ------------------------------------------------------------------
-    def _operational_alerts(self, df: pd.DataFrame, context: RestaurantContext) -> Dict[str, Any]:
-        slot_profile = df.groupby(["weekday", "hour"])["guests_count"].mean().reset_index()
-        slot_profile["occupancy"] = slot_profile["guests_count"] / max(context.capacity, 1)
+    def _operational_alerts(
+        self, df: pd.DataFrame, context: RestaurantContext, cube: Optional[AggregationCube] = None
+    ) -> Dict[str, Any]:
+        cube = cube if cube is not None else AggregationCube.from_frame(df)
 
-        high_pressure = slot_profile[slot_profile["occupancy"] >= 0.85]
-        low_pressure = slot_profile[slot_profile["occupancy"] <= 0.4]
+        # Promedio de comensales por reserva en cada franja con reservas (orden día, hora)
+        weekdays, hours = np.nonzero(cube.counts)
+        occupancy = cube.guests[weekdays, hours] / cube.counts[weekdays, hours] / max(context.capacity, 1)
+        high_pressure = np.flatnonzero(occupancy >= 0.85)[:3]
+        low_pressure = np.flatnonzero(occupancy <= 0.4)[:3]
 
         add_capacity = [
             {
-                "weekday": SPANISH_WEEKDAYS[int(row["weekday"])],
-                "hour": f"{int(row['hour']):02d}:00",
-                "suggested_extra_tables": int(max(round(row["occupancy"] * 10 - 8), 1)),
+                "weekday": SPANISH_WEEKDAYS[int(weekdays[i])],
+                "hour": f"{int(hours[i]):02d}:00",
+                "suggested_extra_tables": int(max(round(occupancy[i] * 10 - 8), 1)),
             }
-            for _, row in high_pressure.head(3).iterrows()
+            for i in high_pressure
         ]
 
         promo_slots = [
             {
-                "weekday": SPANISH_WEEKDAYS[int(row["weekday"])],
-                "hour": f"{int(row['hour']):02d}:00",
-                "expected_occupancy": round(row["occupancy"] * 100, 1),
+                "weekday": SPANISH_WEEKDAYS[int(weekdays[i])],
+                "hour": f"{int(hours[i]):02d}:00",
+                "expected_occupancy": round(float(occupancy[i]) * 100, 1),
             }
-            for _, row in low_pressure.head(3).iterrows()
+            for i in low_pressure
         ]
 
         return {
@@ -510,7 +1029,8 @@ class RestaurantAIInsightsService:
     # ------------------------------------------------------------------
     # Tendencias
     # ------------------------------------------------------------------
-    def _trend_and_seasonality(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _trend_and_seasonality(self, df: pd.DataFrame, cube: Optional[AggregationCube] = None) -> Dict[str, Any]:
+        cube = cube if cube is not None else AggregationCube.from_frame(df)
         monthly = df.set_index("reservation_datetime").resample("M").size()
         trend_pct = 0.0
         if len(monthly) >= 2 and monthly.iloc[-2] > 0:
@@ -523,13 +1043,12 @@ class RestaurantAIInsightsService:
                 f"Reservas máximas habituales en {best_month.strftime('%B %Y')} con {int(monthly.max())} reservas."
             )
 
-        max_slot = df.groupby(["weekday", "hour"])["guests_count"].sum()
         max_info = {}
-        if not max_slot.empty:
-            idx = max_slot.idxmax()
+        if cube.total:
+            weekday, hour = np.unravel_index(int(cube.guests.argmax()), cube.guests.shape)
             max_info = {
-                "weekday": SPANISH_WEEKDAYS[int(idx[0])],
-                "hour": f"{int(idx[1]):02d}:00",
+                "weekday": SPANISH_WEEKDAYS[int(weekday)],
+                "hour": f"{int(hour):02d}:00",
             }
 
         return {
@@ -542,7 +1061,7 @@ class RestaurantAIInsightsService:
     # Utilidades
     # ------------------------------------------------------------------
     def _infer_average_ticket(self, df: pd.DataFrame, restaurant: Dict[str, Any]) -> float:
-        for key in ["avg_ticket", "average_ticket", "ticket_average", "ticket_promedio"]:
+        for key in AVG_TICKET_KEYS:
             raw = restaurant.get(key)
             if raw:
                 return float(raw)
@@ -556,7 +1075,7 @@ class RestaurantAIInsightsService:
         return 1850.0  # RD$ promedio por reserva si no hay dato histórico
 
     def _infer_capacity(self, df: pd.DataFrame, restaurant: Dict[str, Any]) -> int:
-        for key in ["capacity", "seating_capacity", "max_capacity", "tables"]:
+        for key in CAPACITY_KEYS:
             value = restaurant.get(key)
             if isinstance(value, (int, float)) and value > 0:
                 return int(value)
@@ -574,10 +1093,10 @@ class RestaurantAIInsightsService:
             return f"{SPANISH_WEEKDAYS[weekday_index]} cae {round(abs(delta) * 100, 1)} % por debajo del promedio."
         return f"{SPANISH_WEEKDAYS[weekday_index]} se mantiene cercano al promedio semanal."
 
-    def _weekday_multiplier(self, df: pd.DataFrame) -> Dict[int, float]:
-        weekday_totals = df.groupby("weekday")["expected_revenue"].sum().reindex(range(7), fill_value=0)
+    def _weekday_multiplier(self, cube: AggregationCube) -> Dict[int, float]:
+        weekday_totals = cube.revenue.sum(axis=1)
         avg = weekday_totals.mean() or 1
-        return {idx: (value / avg) if avg else 1.0 for idx, value in weekday_totals.items()}
+        return {idx: float(value / avg) if avg else 1.0 for idx, value in enumerate(weekday_totals)}
 
     def _first_available_column(self, df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
         for column in candidates:
@@ -594,5 +1113,29 @@ class RestaurantAIInsightsService:
         return candidate
 
 
+def _select(columns: Optional[List[str]]) -> str:
+    return ", ".join(columns) if columns else "*"
+
+
+def _first(response: Any) -> Dict[str, Any]:
+    return (response.data or [{}])[0]
+
+
+def _build_insights_worker(
+    restaurant_id: str, reservations: pd.DataFrame, restaurant: Dict[str, Any], sections: List[str]
+) -> Dict[str, Any]:
+    """Insights de un restaurante de un lote en el pool de procesos (secciones en serie: el paralelismo es entre restaurantes)."""
+    return RestaurantAIInsightsService(None)._insights_from_frame(
+        restaurant_id, reservations, restaurant, sections, executor="serial"
+    )
+
+
+def _run_sections_worker(
+    sections: List[str], df: pd.DataFrame, inputs: Dict[str, Any]
+) -> Dict[str, Tuple[Any, float]]:
+    """Punto de entrada en el pool de procesos (función de módulo para poder serializarla)."""
+    return RestaurantAIInsightsService(None)._run_sections(sections, df, inputs)
+
+
 # Desactivar advertencias de pandas por copias encadenadas (para no saturar logs)
 pd.options.mode.chained_assignment = None  # type: ignore[attr-defined]
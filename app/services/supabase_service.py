@@ -1,84 +1,387 @@
-from supabase import create_client, Client
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from postgrest.exceptions import APIError
+from supabase import acreate_client, create_client, AsyncClient, Client
 from app.core.config import settings
 import pandas as pd
 
+# Tamaño de página para lecturas paginadas (coincide con el max-rows por defecto de PostgREST)
+DEFAULT_PAGE_SIZE = 1000
+
+# Tipos aplicados a cada página al construir DataFrames de reservaciones
+RESERVATION_DTYPES: Dict[str, str] = {
+    "guests_count": "Int64",
+}
+
+# Códigos de error de PostgREST/Postgres cuando una función RPC o una vista no existe
+MISSING_RELATION_CODES = {"PGRST202", "PGRST205", "42883", "42P01"}
+
+# Códigos de error cuando se selecciona una columna que no existe
+UNDEFINED_COLUMN_CODES = {"42703", "PGRST204"}
+
+
 class SupabaseService:
     def __init__(self):
         self.client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        self._missing_relations: set = set()
+        self._table_columns: Dict[str, frozenset] = {}
+
+    def available_columns(self, table: str, candidates: Sequence[str]) -> Optional[List[str]]:
+        """
+        Columnas de `candidates` que existen en `table`; el esquema se sondea con una fila la
+        primera vez. None si no se puede saber (tabla vacía): el llamador debe pedir todas.
+        """
+        if table not in self._table_columns:
+            sample = self.client.table(table).select("*").limit(1).execute().data or []
+            if not sample:
+                return None
+            self._table_columns[table] = frozenset(sample[0])
+        return _available(candidates, self._table_columns[table])
+
+    def forget_columns(self, table: str) -> None:
+        """Olvida el esquema sondeado de `table` (por ejemplo, si se eliminó una columna)."""
+        self._table_columns.pop(table, None)
 
-    def get_reservations(self):
-        response = self.client.table("reservations").select("*").execute()
-        return response.data
+    def get_reservations(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[Callable[[Any], Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for page in self._iter_pages("reservations", columns, where=where):
+            rows.extend(page)
+        return rows
 
-    def get_most_booked_restaurant(self):
+    def iter_reservations(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        where: Optional[Callable[[Any], Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Recorre la tabla `reservations` por páginas y produce un DataFrame tipado por página.
+
+        - `columns`: columnas a seleccionar (por defecto todas).
+        - `where`: función que recibe el query builder y le agrega filtros (`eq`, `in_`, `gt`...).
+
+        La paginación es por keyset sobre `id`, así que nunca se pierde información por el
+        límite de filas de PostgREST y la memoria usada depende del tamaño de página.
+        """
+        for page in self._iter_pages("reservations", columns, page_size=page_size, where=where):
+            yield self._reservations_frame(page, columns)
+
+    def _iter_pages(
+        self,
+        table: str,
+        columns: Optional[Sequence[str]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        where: Optional[Callable[[Any], Any]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        select, drop_id = _select_clause(columns)
+        last_id = None
+        while True:
+            page = _page_query(self.client, table, select, where, last_id, page_size).execute().data or []
+            if not page:
+                return
+
+            last_id = page[-1]["id"]
+            yield _strip_id(page) if drop_id else page
+
+    def _reservations_frame(
+        self, rows: List[Dict[str, Any]], columns: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        df = pd.DataFrame.from_records(rows, columns=list(columns) if columns else None)
+        for column, dtype in RESERVATION_DTYPES.items():
+            if column in df.columns:
+                df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+        return df
+
+    def get_reservations_watermark(
+        self, restaurant_id: Optional[str] = None
+    ) -> Tuple[int, Optional[str], Optional[str]]:
+        """
+        Marca de agua de los datos: (total de filas, último created_at, último updated_at).
+        Cambia cuando se insertan, eliminan o modifican reservaciones; sirve como clave de caché.
+        """
+        count_query, created_query, updated_query = _watermark_queries(self.client, restaurant_id)
+        return _watermark(count_query.execute(), created_query.execute(), updated_query.execute())
+
+    def get_most_booked_restaurant(self, top_n: int = 1):
       """
-      Retorna el restaurante con más reservaciones, incluyendo su nombre.
+      Retorna el restaurante con más reservaciones, incluyendo su nombre,
+      y en `ranking` los `top_n` restaurantes más reservados.
       """
       try:
-            # Obtener todas las reservaciones
-            data = self.get_reservations()
-            if not data:
+            ranking = self._booking_ranking_from_view(top_n)
+            if ranking is None:
+                  ranking = self._booking_ranking_fallback(top_n)
+
+            if not ranking:
                   return {"mensaje": "No hay reservaciones registradas."}
 
-            # Contar cuántas veces aparece cada restaurante
-            from collections import Counter
-            restaurant_ids = [r["restaurant_id"] for r in data if r.get("restaurant_id")]
-            if not restaurant_ids:
-                  return {"mensaje": "No hay datos válidos de restaurantes en las reservaciones."}
-
-            count = Counter(restaurant_ids)
-            mas_comun = count.most_common(1)[0]  # (id, total)
-
-            # Obtener los datos del restaurante desde Supabase
-            restaurante_data = (
-                  self.client.table("restaurants")
-                  .select("id, name, city, cuisine_type, rating")
-                  .eq("id", mas_comun[0])
-                  .execute()
-            )
-
-            if restaurante_data.data:
-                  restaurante = restaurante_data.data[0]
-                  return {
-                        "restaurant_id": restaurante["id"],
-                        "nombre": restaurante["name"],
-                        "ciudad": restaurante.get("city"),
-                        "tipo_cocina": restaurante.get("cuisine_type"),
-                        "valoracion": restaurante.get("rating"),
-                        "total_reservaciones": mas_comun[1],
-                  }
-            else:
-                  # Si no se encuentra el restaurante (caso raro)
-                  return {
-                        "restaurant_id": mas_comun[0],
-                        "nombre": "Desconocido",
-                        "total_reservaciones": mas_comun[1],
-                  }
+            return {**ranking[0], "ranking": ranking}
 
       except Exception as e:
             return {"error": f"Ocurrió un error al obtener el restaurante con más reservas: {str(e)}"}
 
-    def get_summary(self):
-        data = self.get_reservations()
-        if not data:
+    def _booking_ranking_from_view(self, top_n: int) -> Optional[List[Dict[str, Any]]]:
+        """Top-N ya agrupado y unido con `restaurants` en la vista `restaurant_booking_ranking`."""
+        rows = self._query_relation(
+            "restaurant_booking_ranking",
+            lambda query: query.select("restaurant_id, name, city, cuisine_type, rating, total_reservations")
+            .order("total_reservations", desc=True)
+            .limit(top_n),
+        )
+        if rows is None:
             return None
 
-        total = len(data)
-        confirmed = sum(1 for r in data if r["status"] == "confirmed")
-        completed = sum(1 for r in data if r["status"] == "completed")
-        cancelled = sum(1 for r in data if r["status"] == "cancelled")
+        return [
+            self._format_booked_restaurant(row["restaurant_id"], row, int(row["total_reservations"]))
+            for row in rows
+        ]
+
+    def _booking_ranking_fallback(self, top_n: int) -> List[Dict[str, Any]]:
+        """Cuenta en Python leyendo solo `restaurant_id`, y trae los N restaurantes en una consulta."""
+        counts = pd.Series(dtype="int64")
+        for chunk in self.iter_reservations(columns=["restaurant_id"]):
+            counts = counts.add(chunk["restaurant_id"].dropna().value_counts(), fill_value=0)
+
+        if counts.empty:
+            return []
+
+        top = counts.nlargest(top_n)
+        restaurants = (
+            self.client.table("restaurants")
+            .select("id, name, city, cuisine_type, rating")
+            .in_("id", list(top.index))
+            .execute()
+        ).data or []
+        by_id = {restaurant["id"]: restaurant for restaurant in restaurants}
 
-        avg_guests = sum(r["guests_count"] for r in data) / total if total else 0
+        return [
+            self._format_booked_restaurant(restaurant_id, by_id.get(restaurant_id, {}), int(total))
+            for restaurant_id, total in top.items()
+        ]
+
+    @staticmethod
+    def _format_booked_restaurant(restaurant_id: Any, restaurant: Dict[str, Any], total: int) -> Dict[str, Any]:
+        return {
+            "restaurant_id": restaurant_id,
+            "nombre": restaurant.get("name") or "Desconocido",
+            "ciudad": restaurant.get("city"),
+            "tipo_cocina": restaurant.get("cuisine_type"),
+            "valoracion": restaurant.get("rating"),
+            "total_reservaciones": total,
+        }
+
+    def get_summary(self):
+        rows = self._call_rpc("reservations_summary")
+        if rows is not None:
+            summary = rows[0] if rows else {}
+            total = int(summary.get("total_reservations") or 0)
+            if not total:
+                return None
+            return {
+                "total_reservations": total,
+                "confirmed": int(summary.get("confirmed") or 0),
+                "completed": int(summary.get("completed") or 0),
+                "cancelled": int(summary.get("cancelled") or 0),
+                "average_guests": round(float(summary.get("average_guests") or 0), 2),
+            }
+
+        # Sin la función en la base: una sola pasada vectorizada por página
+        total = 0
+        guests = 0
+        status_counts = pd.Series(dtype="int64")
+        for chunk in self.iter_reservations(columns=["status", "guests_count"]):
+            total += len(chunk)
+            guests += int(chunk["guests_count"].sum())
+            status_counts = status_counts.add(chunk["status"].value_counts(), fill_value=0)
+
+        if not total:
+            return None
 
         return {
             "total_reservations": total,
-            "confirmed": confirmed,
-            "completed": completed,
-            "cancelled": cancelled,
-            "average_guests": round(avg_guests, 2),
+            "confirmed": int(status_counts.get("confirmed", 0)),
+            "completed": int(status_counts.get("completed", 0)),
+            "cancelled": int(status_counts.get("cancelled", 0)),
+            "average_guests": round(guests / total, 2),
         }
-    def get_reservations_df(self) -> pd.DataFrame:
-        """Obtiene las reservaciones desde Supabase como DataFrame."""
-        response = self.client.table("reservations").select("*").execute()
-        data = response.data
-        return pd.DataFrame(data)
\ No newline at end of file
+
+    def _call_rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Ejecuta una función de Postgres vía RPC.
+        Retorna None si la función no está disponible, para que el llamador use su alternativa.
+        """
+        if name in self._missing_relations:
+            return None
+        try:
+            return self.client.rpc(name, params or {}).execute().data
+        except APIError as exc:
+            if exc.code in MISSING_RELATION_CODES:
+                self._missing_relations.add(name)
+            return None
+
+    def _query_relation(self, name: str, build: Callable[[Any], Any]) -> Optional[List[Dict[str, Any]]]:
+        """Igual que `_call_rpc`, pero para vistas: `build` recibe `client.table(name)`."""
+        if name in self._missing_relations:
+            return None
+        try:
+            return build(self.client.table(name)).execute().data or []
+        except APIError as exc:
+            if exc.code in MISSING_RELATION_CODES:
+                self._missing_relations.add(name)
+            return None
+
+    def get_reservations_df(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[Callable[[Any], Any]] = None,
+    ) -> pd.DataFrame:
+        """Obtiene las reservaciones desde Supabase como DataFrame, página por página."""
+        chunks = list(self.iter_reservations(columns, where=where))
+        if not chunks:
+            return pd.DataFrame(columns=list(columns) if columns else None)
+        return pd.concat(chunks, ignore_index=True)
+
+
+class AsyncSupabaseService:
+    """
+    Acceso a Supabase para handlers `async def`.
+    Usa el cliente asíncrono de Supabase, así las consultas no bloquean el event loop.
+    """
+
+    def __init__(self, client: AsyncClient):
+        self.client = client
+        self._table_columns: Dict[str, frozenset] = {}
+
+    @classmethod
+    async def create(cls) -> "AsyncSupabaseService":
+        return cls(await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+
+    async def get_reservations(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[Callable[[Any], Any]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """Igual que `SupabaseService.get_reservations`, paginando por keyset sobre `id`."""
+        select, drop_id = _select_clause(columns)
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            response = await _page_query(self.client, "reservations", select, where, last_id, page_size).execute()
+            page = response.data or []
+            if not page:
+                return rows
+
+            last_id = page[-1]["id"]
+            rows.extend(_strip_id(page) if drop_id else page)
+
+    async def available_columns(self, table: str, candidates: Sequence[str]) -> Optional[List[str]]:
+        """Igual que `SupabaseService.available_columns`."""
+        if table not in self._table_columns:
+            sample = (await self.client.table(table).select("*").limit(1).execute()).data or []
+            if not sample:
+                return None
+            self._table_columns[table] = frozenset(sample[0])
+        return _available(candidates, self._table_columns[table])
+
+    def forget_columns(self, table: str) -> None:
+        self._table_columns.pop(table, None)
+
+    async def get_reservations_watermark(
+        self, restaurant_id: Optional[str] = None
+    ) -> Tuple[int, Optional[str], Optional[str]]:
+        """Igual que `SupabaseService.get_reservations_watermark`."""
+        count_query, created_query, updated_query = _watermark_queries(self.client, restaurant_id)
+        return _watermark(
+            await count_query.execute(), await created_query.execute(), await updated_query.execute()
+        )
+
+
+# ----------------------------------------------------------------------
+# Constructores de consultas compartidos por los clientes sync y async
+# ----------------------------------------------------------------------
+def _select_clause(columns: Optional[Sequence[str]]) -> Tuple[str, bool]:
+    """Retorna el `select` a usar y si hay que quitar `id` (agregado solo para paginar)."""
+    if not columns:
+        return "*", False
+    selected = list(dict.fromkeys(columns))
+    if "id" in selected:
+        return ", ".join(selected), False
+    return ", ".join(selected + ["id"]), True
+
+
+def _page_query(
+    client: Any,
+    table: str,
+    select: str,
+    where: Optional[Callable[[Any], Any]],
+    last_id: Any,
+    page_size: int,
+) -> Any:
+    query = client.table(table).select(select)
+    if where is not None:
+        query = where(query)
+    if last_id is not None:
+        query = query.gt("id", last_id)
+    return query.order("id").limit(page_size)
+
+
+def _available(candidates: Sequence[str], existing: frozenset) -> List[str]:
+    return [column for column in dict.fromkeys(candidates) if column in existing]
+
+
+def _strip_id(page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in row.items() if k != "id"} for row in page]
+
+
+def _watermark_queries(client: Any, restaurant_id: Optional[str]) -> Tuple[Any, Any, Any]:
+    def scoped(query: Any) -> Any:
+        return query.eq("restaurant_id", restaurant_id) if restaurant_id else query
+
+    # El conteo va aparte: incluye las filas sin `created_at`, que las otras consultas descartan
+    total = scoped(client.table("reservations").select("id", count="exact", head=True))
+    # Sin el filtro, los NULL quedan primero en orden DESC y fijarían la marca de agua
+    latest_created = (
+        scoped(client.table("reservations").select("created_at"))
+        .not_.is_("created_at", "null")
+        .order("created_at", desc=True)
+        .limit(1)
+    )
+    latest_updated = (
+        scoped(client.table("reservations").select("updated_at"))
+        .not_.is_("updated_at", "null")
+        .order("updated_at", desc=True)
+        .limit(1)
+    )
+    return total, latest_created, latest_updated
+
+
+def _watermark(
+    total: Any, latest_created: Any, latest_updated: Any
+) -> Tuple[int, Optional[str], Optional[str]]:
+    created_rows = latest_created.data or []
+    updated_rows = latest_updated.data or []
+    return (
+        int(total.count or 0),
+        created_rows[0].get("created_at") if created_rows else None,
+        updated_rows[0].get("updated_at") if updated_rows else None,
+    )
+
+
+def rows_watermark(df: pd.DataFrame) -> Tuple[int, Optional[str], Optional[str]]:
+    """
+    Marca de agua de reservaciones ya leídas (por ejemplo, un grupo de un lote), con el mismo
+    formato que `get_reservations_watermark` para compartir claves de caché sin otra consulta.
+    """
+
+    def latest(column: str) -> Optional[str]:
+        if column not in df.columns:
+            return None
+        values = df[column].dropna()
+        return values.max() if not values.empty else None
+
+    return int(len(df)), latest("created_at"), latest("updated_at")
@@ -0,0 +1,161 @@
+"""Entrenamiento del modelo como trabajo con estado consultable por `job_id`."""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.core.executors import get_training_pool, reset_training_pool
+
+# En AWS Lambda el entorno se congela en cuanto se envía la respuesta: un trabajo en segundo
+# plano quedaría detenido hasta la siguiente invocación de ese contenedor. Ahí (o con
+# TRAINING_IN_BACKGROUND=0) el entrenamiento corre dentro de la petición.
+TRAINING_IN_BACKGROUND = os.getenv(
+    "TRAINING_IN_BACKGROUND", "0" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "1"
+) == "1"
+# Candado entre procesos del mismo host (workers de uvicorn, pool de entrenamiento)
+TRAINING_LOCK_PATH = os.path.join(tempfile.gettempdir(), "foodai_entrenamiento.lock")
+
+
+class TrainingJobManager:
+    """
+    Ejecuta el entrenamiento y guarda el estado de los últimos trabajos.
+
+    En segundo plano el trabajo va al pool de entrenamiento (un solo worker, aparte del
+    pool de insights); si no, corre dentro de la llamada a `iniciar`. Solo hay un
+    entrenamiento en curso por proceso: las solicitudes que llegan mientras tanto reciben
+    ese mismo trabajo en lugar de entrenar otra vez.
+
+    El historial vive en memoria del proceso, así que `obtener` solo conoce los trabajos
+    iniciados en esta instancia.
+    """
+
+    def __init__(
+        self,
+        ejecutar: Optional[Callable[[str], Dict[str, Any]]] = None,
+        *,
+        en_segundo_plano: bool = TRAINING_IN_BACKGROUND,
+        executor: Callable[[], Executor] = get_training_pool,
+        reiniciar_executor: Callable[[], None] = reset_training_pool,
+        max_historial: int = 50,
+    ) -> None:
+        self.ejecutar = ejecutar or _ejecutar_entrenamiento
+        self.en_segundo_plano = en_segundo_plano
+        self.executor = executor
+        self.reiniciar_executor = reiniciar_executor
+        self.max_historial = max_historial
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._en_curso: Optional[str] = None
+
+    def iniciar(self, modo: str) -> Tuple[Dict[str, Any], bool]:
+        """Inicia un entrenamiento; retorna el trabajo y si es nuevo (False si ya había uno en curso)."""
+        with self._lock:
+            if self._en_curso is not None:
+                return dict(self._jobs[self._en_curso]), False
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "estado": "en_curso",
+                "modo": modo,
+                "creado": datetime.now().isoformat(),
+                "finalizado": None,
+                "duracion_s": None,
+                "resultado": None,
+                "error": None,
+            }
+            self._en_curso = job_id
+            self._recortar()
+            job = dict(self._jobs[job_id])
+
+        inicio = time.monotonic()
+        if not self.en_segundo_plano:
+            try:
+                self._terminar(job_id, inicio, resultado=self.ejecutar(modo))
+            except Exception as exc:
+                self._terminar(job_id, inicio, error=str(exc) or type(exc).__name__)
+            return self.obtener(job_id), True
+
+        try:
+            future = self.executor().submit(self.ejecutar, modo)
+        except Exception as exc:  # pool cerrado o roto: el próximo trabajo usará uno nuevo
+            self.reiniciar_executor()
+            self._terminar(job_id, inicio, error=str(exc) or type(exc).__name__)
+            return self.obtener(job_id), True
+
+        future.add_done_callback(lambda done: self._al_terminar(job_id, inicio, done))
+        return job, True
+
+    def obtener(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _al_terminar(self, job_id: str, inicio: float, future: Future) -> None:
+        try:
+            resultado = future.result()
+        except BrokenProcessPool as exc:
+            self.reiniciar_executor()
+            self._terminar(job_id, inicio, error=str(exc) or type(exc).__name__)
+        except BaseException as exc:  # incluye CancelledError al cerrar los pools
+            self._terminar(job_id, inicio, error=str(exc) or type(exc).__name__)
+        else:
+            self._terminar(job_id, inicio, resultado=resultado)
+
+    def _terminar(
+        self, job_id: str, inicio: float, resultado: Any = None, error: Optional[str] = None
+    ) -> None:
+        if isinstance(resultado, dict) and "error" in resultado:
+            error = resultado["error"]
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(
+                    estado="fallido" if error else "completado",
+                    finalizado=datetime.now().isoformat(),
+                    duracion_s=round(time.monotonic() - inicio, 2),
+                    resultado=resultado,
+                    error=error,
+                )
+            if self._en_curso == job_id:
+                self._en_curso = None
+
+    def _recortar(self) -> None:
+        terminados = [job_id for job_id, job in self._jobs.items() if job["estado"] != "en_curso"]
+        for job_id in terminados[: max(len(self._jobs) - self.max_historial, 0)]:
+            del self._jobs[job_id]
+
+
+def _ejecutar_entrenamiento(modo: str) -> Dict[str, Any]:
+    """Punto de entrada del trabajo (función de módulo para poder enviarla a otro proceso)."""
+    from app.services.ai_service import entrenar_desde_supabase
+    from app.services.supabase_service import SupabaseService
+
+    with _candado_entrenamiento():
+        return entrenar_desde_supabase(SupabaseService(), modo)
+
+
+@contextmanager
+def _candado_entrenamiento() -> Iterator[None]:
+    """Serializa entrenamientos de distintos procesos del host (no-op donde no hay `fcntl`)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(TRAINING_LOCK_PATH, "a") as archivo:
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
@@ -0,0 +1,58 @@
+"""Micro-benchmark del renderizado de emails de notificación.
+
+Compara el costo de `render_email` (plantilla precompilada y cacheada) con leer y
+compilar la plantilla en cada llamada, que es lo que haría un motor sin caché:
+
+    python benchmarks/email_templates.py --iterations 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import timeit
+from string import Template
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.email_templates import TEMPLATES_DIR, render_email, render_fragment  # noqa: E402
+
+CONTEXT = {
+    "customer_name": "María Pérez",
+    "restaurant_name": "La Casa del Chef",
+    "new_date": "2025-11-02",
+    "new_time": "20:30",
+    "old_date": "2025-11-01",
+    "old_time": "19:00",
+    "guests_count": 4,
+    "reservation_id": "2cbb0ee2-d9c9-4986-a32e-b4326ad2abb5",
+}
+
+
+def render_cached() -> str:
+    return render_email(
+        "reservation_rescheduled_customer",
+        {**CONTEXT, "reason_block": render_fragment("reason", {"label": "Motivo:", "reason": "Cambio de planes"})},
+    )
+
+
+def render_uncached() -> str:
+    with open(os.path.join(TEMPLATES_DIR, "reservation_rescheduled_customer.html"), encoding="utf-8") as handle:
+        template = Template(handle.read())
+    return template.substitute({**CONTEXT, "reason_block": "<p><strong>Motivo:</strong> Cambio de planes</p>"})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    render_cached()  # compilar antes de medir
+    for label, func in (("precompilada", render_cached), ("sin caché", render_uncached)):
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{label:<14}{seconds / args.iterations * 1e6:>10.1f} µs/render")
+
+
+if __name__ == "__main__":
+    main()
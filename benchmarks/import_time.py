@@ -0,0 +1,110 @@
+"""Mide el costo de importación de `app.main` (arranque en frío del handler de Lambda).
+
+Ejecuta `python -X importtime -c "import app.main"` en un proceso limpio, interpreta
+su salida y muestra los módulos más costosos. Sirve también como verificación de
+presupuesto:
+
+    python benchmarks/import_time.py --top 15
+    python benchmarks/import_time.py --budget-ms 400 --forbid pandas,sklearn,supabase
+
+Termina con código 1 si se supera el presupuesto o si se importó algún módulo prohibido.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def run_importtime(target: str) -> str:
+    """Importa `target` en un intérprete nuevo y retorna el stderr de `-X importtime`."""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"No se pudo importar {target}:\n{completed.stderr}")
+    return completed.stderr
+
+
+def parse_importtime(output: str) -> Dict[str, ImportEntry]:
+    """Convierte las líneas `import time: self | cumulative | module` en un diccionario por módulo."""
+    entries: Dict[str, ImportEntry] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+            name = module.strip()
+            entries[name] = ImportEntry(name, int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return entries
+
+
+def top_level_cost(entries: Dict[str, ImportEntry]) -> Dict[str, int]:
+    """Suma el tiempo propio por paquete raíz (pandas, sklearn, fastapi...)."""
+    totals: Dict[str, int] = {}
+    for entry in entries.values():
+        root = entry.module.split(".")[0]
+        totals[root] = totals.get(root, 0) + entry.self_us
+    return totals
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="app.main", help="Módulo a importar (por defecto app.main)")
+    parser.add_argument("--top", type=int, default=10, help="Cantidad de paquetes a mostrar")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Tiempo máximo de importación permitido")
+    parser.add_argument(
+        "--forbid",
+        default="",
+        help="Paquetes que no deben importarse al arrancar, separados por coma (ej. pandas,sklearn)",
+    )
+    args = parser.parse_args(argv)
+
+    entries = parse_importtime(run_importtime(args.target))
+    if args.target not in entries:
+        raise SystemExit(f"No se encontró {args.target} en la salida de -X importtime")
+
+    total_ms = entries[args.target].cumulative_us / 1000
+    print(f"{args.target}: {total_ms:.1f} ms acumulados ({len(entries)} módulos)")
+    print(f"{'paquete':<30}{'ms':>10}")
+    ranking = sorted(top_level_cost(entries).items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in ranking[: args.top]:
+        print(f"{package:<30}{self_us / 1000:>10.1f}")
+
+    failed = False
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"❌ Presupuesto excedido: {total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+
+    imported_roots = {name.split(".")[0] for name in entries}
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    for package in forbidden:
+        if package in imported_roots:
+            print(f"❌ {package} se importa durante el arranque")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Benchmark de los indicadores de `RestaurantAIInsightsService` con datos sintéticos.
+
+Genera N reservaciones para un restaurante (sin tocar Supabase) y mide los
+indicadores vectorizados a distintas escalas:
+
+    python benchmarks/insights.py --sizes 1000 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.restaurant_insights_service import (  # noqa: E402
+    AggregationCube,
+    RestaurantAIInsightsService,
+    RestaurantContext,
+)
+
+CITIES = ["Santo Domingo", "Santiago", "La Romana", "Punta Cana", "Puerto Plata"]
+STATUSES = ["confirmed", "completed", "pending", "cancelled"]
+
+
+def make_reservations(n: int, seed: int = 42) -> pd.DataFrame:
+    """Reservaciones con el mismo formato que devuelve Supabase (fechas como texto)."""
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    days = rng.integers(-540, 30, size=n)
+    hours = rng.choice(np.arange(12, 23), size=n)
+    minutes = rng.choice([0, 30], size=n)
+    reservation_dt = pd.to_datetime(now.date()) + pd.to_timedelta(days, unit="D") + pd.to_timedelta(
+        hours * 60 + minutes, unit="m"
+    )
+    lead = pd.to_timedelta(rng.exponential(3.0, size=n), unit="D")
+
+    return pd.DataFrame(
+        {
+            "id": [f"res-{i}" for i in range(n)],
+            "restaurant_id": "bench-restaurant",
+            "reservation_date": reservation_dt.strftime("%Y-%m-%d"),
+            "reservation_time": reservation_dt.strftime("%H:%M:%S"),
+            "guests_count": rng.integers(1, 10, size=n),
+            "status": rng.choice(STATUSES, size=n, p=[0.5, 0.25, 0.15, 0.10]),
+            "created_at": (reservation_dt - lead).strftime("%Y-%m-%dT%H:%M:%S"),
+            "customer_email": [f"cliente{c}@mail.com" for c in rng.integers(0, max(n // 4, 1), size=n)],
+            "customer_city": rng.choice(CITIES, size=n),
+        }
+    )
+
+
+def best_of(func: Callable[[], object], repeat: int = 3) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def run(sizes: List[int]) -> None:
+    service = RestaurantAIInsightsService(None)  # sin Supabase: solo cálculo
+    context = RestaurantContext(restaurant={}, capacity=60, avg_ticket=1850.0)
+
+    columns = ("prepare", "cube", "cancel", "operations", "cities")
+    header = f"{'filas':>8}{'prepare':>12}{'cubo':>12}{'cancel.':>12}{'operac.':>12}{'ciudades':>12}"
+    print(header)
+    print("-" * len(header))
+    for size in sizes:
+        raw = make_reservations(size)
+        prepared = service._prepare_dataframe(raw, context.avg_ticket)
+        timings: Dict[str, float] = {
+            "prepare": best_of(lambda: service._prepare_dataframe(raw, context.avg_ticket)),
+            "cube": best_of(lambda: AggregationCube.from_frame(prepared)),
+            "cancel": best_of(lambda: service._cancellation_insights(prepared)),
+            "operations": best_of(lambda: service._operational_alerts(prepared, context)),
+            "cities": best_of(lambda: service._city_growth(prepared)),
+        }
+        print(
+            f"{size:>8}"
+            + "".join(f"{timings[key] * 1000:>10.1f}ms" for key in columns)
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+-- Resumen agregado de reservaciones para GET /analisis/resumen.
+-- Devuelve una sola fila en lugar de toda la tabla.
+create or replace function public.reservations_summary()
+returns table (
+  total_reservations bigint,
+  confirmed bigint,
+  completed bigint,
+  cancelled bigint,
+  average_guests numeric
+)
+language sql
+stable
+as $$
+  select
+    count(*) as total_reservations,
+    count(*) filter (where status = 'confirmed') as confirmed,
+    count(*) filter (where status = 'completed') as completed,
+    count(*) filter (where status = 'cancelled') as cancelled,
+    coalesce(avg(guests_count), 0) as average_guests
+  from public.reservations;
+$$;
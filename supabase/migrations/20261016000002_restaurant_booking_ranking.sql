@@ -0,0 +1,16 @@
+-- Ranking de restaurantes por cantidad de reservaciones para
+-- GET /analisis/restaurante-mas-reservado. El conteo y el join se hacen en la base.
+create or replace view public.restaurant_booking_ranking
+with (security_invoker = true)
+as
+select
+  res.restaurant_id,
+  r.name,
+  r.city,
+  r.cuisine_type,
+  r.rating,
+  count(*) as total_reservations
+from public.reservations res
+left join public.restaurants r on r.id = res.restaurant_id
+where res.restaurant_id is not null
+group by res.restaurant_id, r.name, r.city, r.cuisine_type, r.rating;
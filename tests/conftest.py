@@ -0,0 +1,8 @@
+import os
+import sys
+
+# `app.core.config` lee estas variables al importarse; los tests no se conectan a Supabase
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
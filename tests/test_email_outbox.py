@@ -0,0 +1,165 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.models.email import EmailRequest
+from app.services import email_outbox as outbox_module
+from app.services.email_outbox import EmailOutbox
+from app.services.email_sender import EmailServiceError
+
+
+def _email(to="cliente@example.com"):
+    return EmailRequest(to=to, subject="Reservación", html="<p>Hola</p>")
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return EmailOutbox(str(tmp_path / "outbox.sqlite3"), base_delay=60.0, max_attempts=3)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Stub of the email API: records recipients; fails with whatever is queued in `errors`."""
+    calls = {"to": [], "errors": []}
+
+    async def fake_send(payload):
+        calls["to"].append(payload.to)
+        if calls["errors"]:
+            raise calls["errors"].pop(0)
+        return {"success": True}
+
+    monkeypatch.setattr(outbox_module, "send_email_via_api", fake_send)
+    return calls
+
+
+def _row(outbox, row_id):
+    conn = sqlite3.connect(outbox.path)
+    try:
+        return conn.execute(
+            "SELECT status, attempts, next_attempt_at, last_error FROM email_outbox WHERE id = ?", (row_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def test_enqueue_many_groups_emails_by_label(outbox):
+    outbox.enqueue_many({"customer": _email(), "restaurant": _email("local@example.com")}, group_id="n1")
+
+    status = outbox.group_status("n1")
+    assert list(status) == ["customer", "restaurant"]
+    assert status["restaurant"]["to"] == "local@example.com"
+    assert {item["status"] for item in status.values()} == {"queued"}
+    assert outbox.group_status("unknown") is None
+
+
+def test_drain_sends_due_emails(outbox, sent):
+    row_id = outbox.enqueue(_email(), group_id="n1", label="customer")
+
+    assert asyncio.run(outbox.drain()) == {"claimed": 1, "sent": 1, "retrying": 0, "failed": 0}
+    assert sent["to"] == ["cliente@example.com"]
+    assert _row(outbox, row_id)[:2] == ("sent", 1)
+    # Nothing left to claim
+    assert asyncio.run(outbox.drain())["claimed"] == 0
+
+
+def test_retryable_error_is_rescheduled_with_backoff(outbox, sent):
+    row_id = outbox.enqueue(_email())
+    sent["errors"].append(EmailServiceError("throttled", status_code=429))
+
+    before = time.time()
+    assert asyncio.run(outbox.drain())["retrying"] == 1
+
+    status, attempts, next_attempt_at, last_error = _row(outbox, row_id)
+    assert (status, attempts, last_error) == ("queued", 1, "throttled")
+    assert next_attempt_at >= before + 60.0 * 0.8
+    # Not due yet
+    assert asyncio.run(outbox.drain())["claimed"] == 0
+
+
+def test_non_retryable_error_fails_immediately(outbox, sent):
+    row_id = outbox.enqueue(_email())
+    sent["errors"].append(EmailServiceError("bad request", status_code=400))
+
+    assert asyncio.run(outbox.drain())["failed"] == 1
+    assert _row(outbox, row_id)[:2] == ("failed", 1)
+
+
+def test_gives_up_after_max_attempts(outbox, sent):
+    outbox.base_delay = 0.0
+    row_id = outbox.enqueue(_email())
+    sent["errors"].extend(EmailServiceError("down", status_code=503) for _ in range(3))
+
+    results = [asyncio.run(outbox.drain()) for _ in range(3)]
+
+    assert [result["retrying"] for result in results] == [1, 1, 0]
+    assert results[-1]["failed"] == 1
+    assert _row(outbox, row_id)[:2] == ("failed", 3)
+
+
+def test_expired_lease_is_reclaimed(outbox, sent):
+    row_id = outbox.enqueue(_email())
+    # A worker claimed the row and died before recording the outcome
+    assert [claimed[0] for claimed in outbox._claim_batch()] == [row_id]
+    assert outbox._claim_batch() == []
+
+    outbox.claim_timeout = 0.0
+    assert asyncio.run(outbox.drain())["sent"] == 1
+    assert _row(outbox, row_id)[0] == "sent"
+
+
+def test_locked_database_does_not_leak_the_connection(outbox):
+    outbox.enqueue(_email())
+    blocker = sqlite3.connect(outbox.path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        transaction = outbox._connect()
+        transaction.conn.execute("PRAGMA busy_timeout = 0")
+        with pytest.raises(sqlite3.OperationalError):
+            transaction.__enter__()
+        with pytest.raises(sqlite3.ProgrammingError):
+            transaction.conn.execute("SELECT 1")
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+
+def test_purge_deletes_old_sent_and_failed_rows(outbox, sent):
+    outbox.retention = 3600.0
+    old_sent, old_failed, old_queued, recent_sent = (outbox.enqueue(_email()) for _ in range(4))
+    conn = sqlite3.connect(outbox.path, isolation_level=None)
+    try:
+        old = time.time() - 7200
+        conn.executemany(
+            "UPDATE email_outbox SET status = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+            [
+                ("sent", old, old, old_sent),
+                ("failed", old, old, old_failed),
+                ("queued", old, time.time() + 600, old_queued),
+                ("sent", time.time(), time.time(), recent_sent),
+            ],
+        )
+    finally:
+        conn.close()
+
+    assert outbox.purge() == 2
+    assert _row(outbox, old_sent) is None and _row(outbox, old_failed) is None
+    assert _row(outbox, old_queued)[0] == "queued"
+    assert _row(outbox, recent_sent)[0] == "sent"
+
+
+def test_drain_purges_at_most_once_per_interval(outbox, sent, monkeypatch):
+    purges = []
+    purge = outbox.purge
+
+    def counting_purge():
+        purges.append(True)
+        return purge()
+
+    monkeypatch.setattr(outbox, "purge", counting_purge)
+
+    asyncio.run(outbox.drain())
+    asyncio.run(outbox.drain())
+
+    assert purges == [True]
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+import httpx
+
+from app.models.email import EmailRequest
+from app.services import email_sender
+from app.services.email_sender import EmailServiceError, send_emails_concurrently
+
+
+def _email(to):
+    return EmailRequest(to=to, subject="Reservación", html="<p>Hola</p>")
+
+
+def test_individual_failures_do_not_fail_the_batch(monkeypatch):
+    async def fake_send(payload):
+        if payload.to.startswith("json"):
+            raise json.JSONDecodeError("Expecting value", "<html>", 0)
+        if payload.to.startswith("transport"):
+            raise httpx.RemoteProtocolError("peer closed connection")
+        if payload.to.startswith("api"):
+            raise EmailServiceError("Email API responded with status 503", status_code=503)
+        return {"id": payload.to}
+
+    monkeypatch.setattr(email_sender, "send_email_via_api", fake_send)
+    payloads = [_email(f"{name}@example.com") for name in ("ok", "json", "transport", "api", "otro")]
+
+    results = asyncio.run(send_emails_concurrently(payloads, concurrency=2))
+
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [result["status"] for result in results] == ["sent", "failed", "failed", "failed", "sent"]
+    assert results[0]["response"] == {"id": "ok@example.com"}
+    assert "Expecting value" in results[1]["error"]
+    assert results[2]["status_code"] is None
+    assert results[3]["status_code"] == 503
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from app.services import ai_service
+from app.services.ai_service import (
+    CodificadorIncremental,
+    InteligenciaReservas,
+    RequiereEntrenamientoCompleto,
+    entrenar_desde_supabase,
+)
+from app.services.model_registry import RegistroModelos
+
+ESTADOS = ["confirmed", "cancelled", "completed"]
+
+
+def reservaciones(n, restaurantes=("r1", "r2", "r3"), estados=ESTADOS, desde="2025-01-01", seed=0):
+    rng = np.random.default_rng(seed)
+    creadas = pd.Timestamp(desde) + pd.to_timedelta(np.arange(n), unit="min")
+    return pd.DataFrame({
+        "status": rng.choice(estados, n),
+        "guests_count": rng.integers(1, 8, n),
+        "reservation_time": [f"{hora:02d}:00:00" for hora in rng.integers(12, 23, n)],
+        "reservation_date": (pd.Timestamp("2025-03-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="D")).astype(str),
+        "restaurant_id": rng.choice(list(restaurantes), n),
+        "created_at": creadas.astype(str),
+        "updated_at": None,
+    })
+
+
+class FakeSupabase:
+    """Retorna `nuevas` cuando se filtra por marca de agua y `todas` en otro caso."""
+
+    def __init__(self, todas, nuevas=None):
+        self.todas = todas
+        self.nuevas = nuevas if nuevas is not None else todas.iloc[0:0]
+        self.consultas = []
+
+    def get_reservations_df(self, columns=None, where=None):
+        self.consultas.append("incremental" if where is not None else "completo")
+        return self.nuevas if where is not None else self.todas
+
+
+@pytest.fixture
+def registro(tmp_path, monkeypatch):
+    registro = RegistroModelos(str(tmp_path / "paquete.pkl"))
+    monkeypatch.setattr(ai_service, "registro_modelos", registro)
+    # Bosques pequeños: los tests verifican el flujo, no la precisión
+    monkeypatch.setattr(ai_service, "ARBOLES_INICIALES", 10)
+    monkeypatch.setattr(ai_service, "ARBOLES_POR_INCREMENTO", 5)
+    monkeypatch.setattr(ai_service, "MAX_ARBOLES", 100)
+    monkeypatch.setattr(ai_service, "N_JOBS_ENTRENAMIENTO", 1)
+    return registro
+
+
+@pytest.fixture
+def entrenado(registro):
+    resultado = InteligenciaReservas(reservaciones(400)).entrenar_modelo()
+    assert "error" not in resultado
+    return registro.obtener()
+
+
+def test_codificador_ampliado_conserva_codigos():
+    base = CodificadorIncremental().fit(["r2", "r1", "r3"])
+    ampliado = CodificadorIncremental.ampliado(base, ["r9", "r1", "r0"])
+
+    assert list(ampliado.transform(["r1", "r2", "r3"])) == list(base.transform(["r1", "r2", "r3"]))
+    assert list(ampliado.classes_) == ["r1", "r2", "r3", "r0", "r9"]
+    with pytest.raises(ValueError):
+        ampliado.transform(["desconocido"])
+
+
+def test_codificador_ampliado_acepta_label_encoder():
+    base = LabelEncoder().fit(["a", "b"])
+    assert list(CodificadorIncremental.ampliado(base, ["c"]).transform(["a", "b", "c"])) == [0, 1, 2]
+
+
+def test_incremental_conserva_clases_con_filas_ancla(entrenado, registro):
+    # Las reservaciones nuevas solo traen dos de los tres estados y un restaurante nuevo
+    nuevas = reservaciones(120, restaurantes=("r1", "r4"), estados=["confirmed", "completed"], desde="2025-06-01")
+
+    resultado = InteligenciaReservas(nuevas).entrenar_incremental(entrenado)
+
+    assert resultado["modo"] == "incremental"
+    assert resultado["restaurantes_nuevos"] == 1
+    actualizado = registro.obtener()
+    modelo = actualizado.modelo
+    assert modelo.n_estimators == entrenado.modelo.n_estimators + 5
+    assert list(modelo.classes_) == list(entrenado.modelo.classes_)
+    assert modelo.predict_proba(np.array([[0, 20, 4, 2]])).shape == (1, len(ESTADOS))
+    assert list(actualizado.encoder_restaurante.transform(["r1", "r2", "r3"])) == [0, 1, 2]
+    assert actualizado.metadatos["marca_agua"] > entrenado.metadatos["marca_agua"]
+    assert actualizado.metadatos["incrementos"] == 1
+
+
+def test_pocas_filas_no_mueven_la_marca_de_agua(entrenado, registro):
+    nuevas = reservaciones(ai_service.MIN_FILAS_INCREMENTO - 1, desde="2025-06-01")
+
+    resultado = InteligenciaReservas(nuevas).entrenar_incremental(entrenado)
+
+    assert resultado["filas_nuevas"] == ai_service.MIN_FILAS_INCREMENTO - 1
+    assert resultado["marca_agua"] == entrenado.metadatos["marca_agua"]
+    assert registro.obtener().version == entrenado.version
+
+
+def test_sin_filas_nuevas(entrenado):
+    resultado = InteligenciaReservas(reservaciones(0)).entrenar_incremental(entrenado)
+    assert resultado["filas_nuevas"] == 0
+    assert resultado["mensaje"].startswith("No hay reservaciones nuevas")
+
+
+def test_estado_nuevo_requiere_entrenamiento_completo(entrenado):
+    nuevas = reservaciones(120, estados=["no_show"], desde="2025-06-01")
+    with pytest.raises(RequiereEntrenamientoCompleto):
+        InteligenciaReservas(nuevas).entrenar_incremental(entrenado)
+
+
+def test_maximo_de_arboles_requiere_entrenamiento_completo(entrenado, monkeypatch):
+    monkeypatch.setattr(ai_service, "MAX_ARBOLES", entrenado.modelo.n_estimators)
+    with pytest.raises(RequiereEntrenamientoCompleto):
+        InteligenciaReservas(reservaciones(120, desde="2025-06-01")).entrenar_incremental(entrenado)
+
+
+def test_desde_supabase_reentrena_completo_con_estado_nuevo(entrenado):
+    todas = reservaciones(400, estados=ESTADOS + ["no_show"])
+    supabase = FakeSupabase(todas, nuevas=reservaciones(120, estados=["no_show"], desde="2025-06-01"))
+
+    resultado = entrenar_desde_supabase(supabase, "incremental")
+
+    assert supabase.consultas == ["incremental", "completo"]
+    assert resultado["modo"] == "completo"
+    assert "estados" in resultado["motivo"]
+
+
+def test_desde_supabase_sin_modelo_reentrena_completo(registro):
+    supabase = FakeSupabase(reservaciones(400))
+
+    resultado = entrenar_desde_supabase(supabase, "incremental")
+
+    assert supabase.consultas == ["completo"]
+    assert resultado["modo"] == "completo"
+    assert "motivo" in resultado
+
+
+def test_modo_por_defecto_es_completo(entrenado):
+    supabase = FakeSupabase(reservaciones(400))
+
+    resultado = entrenar_desde_supabase(supabase)
+
+    assert supabase.consultas == ["completo"]
+    assert "motivo" not in resultado
@@ -0,0 +1,57 @@
+import json
+
+import joblib
+from sklearn.preprocessing import LabelEncoder
+
+from app.services.model_registry import RegistroModelos
+
+
+def _encoder(valores):
+    return LabelEncoder().fit(valores)
+
+
+def test_publicar_escribe_un_solo_paquete(tmp_path):
+    registro = RegistroModelos(str(tmp_path / "paquete.pkl"))
+
+    registro.publicar("modelo-1", _encoder(["a"]), _encoder(["r1", "r2"]), {"marca_agua": "2025-01-01"})
+
+    assert sorted(ruta.name for ruta in tmp_path.iterdir()) == ["paquete.pkl"]
+    # Otro proceso (otra instancia) lee el mismo conjunto desde disco
+    cargado = RegistroModelos(str(tmp_path / "paquete.pkl")).obtener()
+    assert cargado.modelo == "modelo-1"
+    assert list(cargado.encoder_restaurante.classes_) == ["r1", "r2"]
+    assert cargado.metadatos == {"marca_agua": "2025-01-01"}
+
+
+def test_recarga_el_paquete_publicado_por_otro_proceso(tmp_path):
+    lector = RegistroModelos(str(tmp_path / "paquete.pkl"))
+    escritor = RegistroModelos(str(tmp_path / "paquete.pkl"))
+    escritor.publicar("modelo-1", _encoder(["a"]), _encoder(["r1"]))
+    assert lector.obtener().modelo == "modelo-1"
+
+    escritor.publicar("modelo-2", _encoder(["a"]), _encoder(["r0", "r1"]), {"incrementos": 1})
+
+    cargado = lector.obtener()
+    assert cargado.modelo == "modelo-2"
+    assert list(cargado.encoder_restaurante.classes_) == ["r0", "r1"]
+    assert cargado.metadatos == {"incrementos": 1}
+
+
+def test_sin_artefactos_no_hay_modelo(tmp_path):
+    assert RegistroModelos(str(tmp_path / "paquete.pkl")).obtener() is None
+
+
+def test_lee_artefactos_sueltos_hasta_el_primer_paquete(tmp_path):
+    rutas = [str(tmp_path / nombre) for nombre in ("modelo.pkl", "estado.pkl", "restaurante.pkl")]
+    for objeto, ruta in zip(("modelo-viejo", _encoder(["a"]), _encoder(["r1"])), rutas):
+        joblib.dump(objeto, ruta)
+    metadatos = tmp_path / "metadatos.json"
+    metadatos.write_text(json.dumps({"marca_agua": "2024-12-31"}), encoding="utf-8")
+    registro = RegistroModelos(str(tmp_path / "paquete.pkl"), rutas_legado=(*rutas, str(metadatos)))
+
+    legado = registro.obtener()
+    assert (legado.modelo, legado.metadatos) == ("modelo-viejo", {"marca_agua": "2024-12-31"})
+
+    registro.publicar("modelo-nuevo", _encoder(["a"]), _encoder(["r1"]))
+    assert joblib.load(rutas[0]) == "modelo-viejo"
+    assert RegistroModelos(str(tmp_path / "paquete.pkl"), rutas_legado=rutas).obtener().modelo == "modelo-nuevo"
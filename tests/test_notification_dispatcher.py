@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.models.email import EmailRequest
+from app.services import email_outbox as outbox_module
+from app.services.email_outbox import EmailOutbox
+from app.services.notification_dispatcher import NotificationDispatcher
+
+
+def _email(to):
+    return EmailRequest(to=to, subject="Reservación", html="<p>Hola</p>")
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return EmailOutbox(str(tmp_path / "outbox.sqlite3"), base_delay=0.0)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    recipients = []
+
+    async def fake_send(payload):
+        recipients.append(payload.to)
+        return {"success": True}
+
+    monkeypatch.setattr(outbox_module, "send_email_via_api", fake_send)
+    return recipients
+
+
+def test_deliver_sends_only_its_notification_while_the_worker_runs(outbox, sent):
+    outbox.enqueue_many({"customer": _email("otro@example.com")}, group_id="other")
+    outbox.worker_running = True
+    dispatcher = NotificationDispatcher(outbox)
+
+    async def run():
+        notification_id = await dispatcher.queue(
+            {"customer": _email("cliente@example.com"), "restaurant": _email("local@example.com")}
+        )
+        await dispatcher.deliver(notification_id)
+        return notification_id
+
+    notification_id = asyncio.run(run())
+
+    assert sorted(sent) == ["cliente@example.com", "local@example.com"]
+    status = asyncio.run(dispatcher.status(notification_id))
+    assert {item["status"] for item in status["deliveries"].values()} == {"sent"}
+    assert outbox.group_status("other")["customer"]["status"] == "queued"
+
+
+def test_without_worker_deliver_sends_a_bounded_batch_of_other_emails(outbox, sent):
+    for index in range(5):
+        outbox.enqueue(_email(f"pendiente{index}@example.com"), group_id=f"old-{index}")
+    dispatcher = NotificationDispatcher(outbox, retry_batch=2)
+
+    async def run():
+        await dispatcher.deliver(await dispatcher.queue({"customer": _email("cliente@example.com")}))
+
+    asyncio.run(run())
+
+    assert sent[0] == "cliente@example.com"
+    assert len(sent) == 1 + 2
+
+
+def test_deliver_is_bounded_by_the_timeout(outbox, monkeypatch):
+    async def slow_send(payload):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(outbox_module, "send_email_via_api", slow_send)
+    dispatcher = NotificationDispatcher(outbox, delivery_timeout=0.05)
+
+    async def run():
+        notification_id = await dispatcher.queue({"customer": _email("cliente@example.com")})
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await dispatcher.deliver(notification_id)
+        return notification_id, loop.time() - start
+
+    notification_id, elapsed = asyncio.run(run())
+
+    assert elapsed < 1
+    # Left claimed; the lease makes it due again later
+    assert outbox.group_status(notification_id)["customer"]["status"] == "sending"
@@ -0,0 +1,183 @@
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from app.api.deps import get_insights_service
+from app.api.v1.routes_restaurant_insights import router
+from app.services import restaurant_insights_service as insights_module
+from app.services.restaurant_insights_service import INSIGHT_SECTIONS, RestaurantAIInsightsService
+
+RESTAURANTS = [{"id": "r1", "name": "La Terraza"}]
+
+
+class FakeQuery:
+    """Subconjunto del builder de PostgREST; `single()` falla como PostgREST si no hay fila."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.single_row = False
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.rows = [row for row in self.rows if row.get(column) == value]
+        return self
+
+    def limit(self, size):
+        self.rows = self.rows[:size]
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def execute(self):
+        if self.single_row and len(self.rows) != 1:
+            raise APIError({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"})
+        return SimpleNamespace(data=self.rows[0] if self.single_row else self.rows)
+
+
+class AsyncFakeQuery(FakeQuery):
+    async def execute(self):
+        return FakeQuery.execute(self)
+
+
+class FakeSupabase:
+    query_class = FakeQuery
+
+    def __init__(self, reservations=()):
+        self.reservations = list(reservations)
+        self.client = SimpleNamespace(table=lambda name: self.query_class(RESTAURANTS if name == "restaurants" else []))
+
+    def get_reservations_watermark(self, restaurant_id=None):
+        return len(self.reservations), None, None
+
+    def available_columns(self, table, candidates):
+        return None
+
+    def forget_columns(self, table):
+        pass
+
+    def get_reservations(self, columns=None, where=None):
+        return where(FakeQuery(self.reservations)).rows
+
+
+class AsyncFakeSupabase(FakeSupabase):
+    query_class = AsyncFakeQuery
+
+    async def get_reservations_watermark(self, restaurant_id=None):
+        return FakeSupabase.get_reservations_watermark(self, restaurant_id)
+
+    async def available_columns(self, table, candidates):
+        return None
+
+    async def get_reservations(self, columns=None, where=None):
+        return FakeSupabase.get_reservations(self, columns, where)
+
+
+@pytest.fixture
+def service():
+    return RestaurantAIInsightsService(FakeSupabase(), AsyncFakeSupabase())
+
+
+def test_unknown_restaurant_raises_value_error(service):
+    with pytest.raises(ValueError, match="No hay reservaciones"):
+        service.generate_insights("missing")
+
+
+def test_missing_restaurant_row_is_empty(service):
+    assert service._fetch_restaurant("missing") == {}
+    assert service._fetch_restaurant("r1") == RESTAURANTS[0]
+
+
+@pytest.mark.parametrize("with_async_client", [True, False])
+def test_unknown_restaurant_returns_404(service, with_async_client):
+    if not with_async_client:
+        service.async_supabase = None
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_insights_service] = lambda: service
+
+    response = TestClient(app).get("/api/v1/restaurants/missing/ai-insights")
+
+    assert response.status_code == 404
+    assert "No hay reservaciones" in response.json()["detail"]
+
+
+def _reservation(index, customer=None, status="confirmed", days=-3, hour=20, **extra):
+    when = pd.Timestamp.now().normalize() + pd.Timedelta(days=days, hours=hour)
+    row = {
+        "id": f"res-{index}",
+        "restaurant_id": "r1",
+        "reservation_date": when.strftime("%Y-%m-%d"),
+        "reservation_time": when.strftime("%H:%M:%S"),
+        "guests_count": 2 + index % 5,
+        "status": status,
+        "created_at": (when - pd.Timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%S"),
+        **extra,
+    }
+    if customer is not None:
+        row["customer_email"] = customer
+    return row
+
+
+DEGENERATE_FRAMES = {
+    "sin_columna_de_cliente_ni_cancelaciones": [_reservation(i, days=-i) for i in range(4)],
+    "un_cliente_sin_cancelaciones": [_reservation(i, "ana@example.com", days=-i) for i in range(3)],
+    "tres_filas_dos_clientes": [
+        _reservation(0, "ana@example.com", "cancelled"),
+        _reservation(1, "ana@example.com", days=2),
+        _reservation(2, "luis@example.com", days=5),
+    ],
+    "una_sola_fila": [_reservation(0, "ana@example.com")],
+    "todas_canceladas": [_reservation(i, f"c{i}@example.com", "cancelled", days=i - 2) for i in range(4)],
+    "con_montos_y_ciudades": [
+        _reservation(i, f"c{i % 3}@example.com", ["confirmed", "completed", "pending", "cancelled"][i % 4],
+                     days=i * 9 - 200, hour=12 + i % 10, total_amount=900.0 + i, customer_city=["Santiago", "La Romana"][i % 2])
+        for i in range(40)
+    ],
+}
+
+
+@pytest.mark.parametrize("executor", ["serial", "threads"])
+@pytest.mark.parametrize("frame", list(DEGENERATE_FRAMES))
+def test_every_section_handles_small_frames(frame, executor, monkeypatch):
+    monkeypatch.setattr(insights_module, "INSIGHTS_EXECUTOR", executor)
+    service = RestaurantAIInsightsService(FakeSupabase(DEGENERATE_FRAMES[frame]))
+
+    insights = service.generate_insights("r1")
+
+    assert set(insights["indicators"]) == set(INSIGHT_SECTIONS)
+    json.dumps(insights, default=str)
+
+
+def test_route_returns_insights_for_a_restaurant_without_cancellations():
+    rows = DEGENERATE_FRAMES["sin_columna_de_cliente_ni_cancelaciones"]
+    service = RestaurantAIInsightsService(FakeSupabase(rows), AsyncFakeSupabase(rows))
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_insights_service] = lambda: service
+
+    response = TestClient(app).get("/api/v1/restaurants/r1/ai-insights")
+
+    assert response.status_code == 200
+    assert set(response.json()["indicators"]) == set(INSIGHT_SECTIONS)
+
+
+def test_cache_hits_keep_the_compute_block():
+    service = RestaurantAIInsightsService(FakeSupabase(DEGENERATE_FRAMES["con_montos_y_ciudades"]))
+
+    computed = service.generate_insights("r1", ["demand_capacity"])
+    partial = service.generate_insights("r1", ["demand_capacity", "operations"])
+    cached = service.generate_insights("r1", ["demand_capacity", "operations"])
+
+    assert set(computed["compute"]["sections_ms"]) == {"demand_capacity"}
+    assert set(partial["compute"]["sections_ms"]) == {"operations"}
+    assert cached["compute"] == {"executor": "cache", "sections_ms": {}}
+    assert set(cached) == set(computed)
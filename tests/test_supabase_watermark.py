@@ -0,0 +1,24 @@
+from postgrest import SyncPostgrestClient
+
+from app.services.supabase_service import _watermark_queries
+
+
+def _params(query):
+    return dict(query.request.params)
+
+
+def test_latest_created_ignores_null_created_at():
+    _, latest_created, _ = _watermark_queries(SyncPostgrestClient("http://supabase.test"), "r1")
+
+    params = _params(latest_created)
+    assert params["created_at"] == "not.is.null"
+    assert params["order"] == "created_at.desc"
+    assert params["restaurant_id"] == "eq.r1"
+
+
+def test_total_counts_every_row():
+    total, _, _ = _watermark_queries(SyncPostgrestClient("http://supabase.test"), None)
+
+    params = _params(total)
+    assert "created_at" not in params
+    assert "count=exact" in total.request.headers["prefer"]
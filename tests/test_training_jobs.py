@@ -0,0 +1,167 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_training_jobs
+from app.api.v1.routes_predict_ai import router
+from app.services.training_jobs import TrainingJobManager
+
+
+class Entrenamiento:
+    """Trabajo de prueba que espera a `liberar` antes de terminar."""
+
+    def __init__(self, resultado=None):
+        self.resultado = resultado or {"mensaje": "Modelo entrenado correctamente", "precision": 90.0}
+        self.llamadas = []
+        self.liberar = threading.Event()
+
+    def __call__(self, modo):
+        self.llamadas.append(modo)
+        self.liberar.wait(timeout=5)
+        return self.resultado
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def _esperar(jobs, job_id):
+    for _ in range(500):
+        job = jobs.obtener(job_id)
+        if job["estado"] != "en_curso":
+            return job
+        time.sleep(0.01)
+    raise AssertionError("el trabajo no terminó")
+
+
+def test_solicitudes_concurrentes_reutilizan_el_trabajo(pool):
+    entrenamiento = Entrenamiento()
+    jobs = TrainingJobManager(entrenamiento, en_segundo_plano=True, executor=lambda: pool)
+
+    primero, nuevo = jobs.iniciar("completo")
+    segundo, otro_nuevo = jobs.iniciar("incremental")
+
+    assert (nuevo, otro_nuevo) == (True, False)
+    assert segundo["job_id"] == primero["job_id"]
+    assert primero["estado"] == "en_curso"
+
+    entrenamiento.liberar.set()
+    job = _esperar(jobs, primero["job_id"])
+    assert job["estado"] == "completado"
+    assert job["resultado"]["precision"] == 90.0
+    assert entrenamiento.llamadas == ["completo"]
+
+    # Terminado el trabajo, la siguiente solicitud entrena de nuevo
+    tercero, nuevo = jobs.iniciar("incremental")
+    assert nuevo and tercero["job_id"] != primero["job_id"]
+    _esperar(jobs, tercero["job_id"])
+
+
+def test_resultado_con_error_marca_el_trabajo_fallido(pool):
+    entrenamiento = Entrenamiento({"error": "No hay datos válidos"})
+    entrenamiento.liberar.set()
+    jobs = TrainingJobManager(entrenamiento, en_segundo_plano=True, executor=lambda: pool)
+
+    job = _esperar(jobs, jobs.iniciar("completo")[0]["job_id"])
+
+    assert job["estado"] == "fallido"
+    assert job["error"] == "No hay datos válidos"
+
+
+def test_fallo_al_enviar_reinicia_el_pool_y_libera_el_candado():
+    reinicios = []
+
+    class PoolCerrado:
+        def submit(self, *args, **kwargs):
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+    jobs = TrainingJobManager(
+        Entrenamiento(),
+        en_segundo_plano=True,
+        executor=PoolCerrado,
+        reiniciar_executor=lambda: reinicios.append(True),
+    )
+
+    job, nuevo = jobs.iniciar("completo")
+
+    assert nuevo and job["estado"] == "fallido"
+    assert "shutdown" in job["error"]
+    assert reinicios == [True]
+    assert jobs.iniciar("completo")[1] is True
+
+
+def test_pool_roto_se_reinicia():
+    reinicios = []
+    roto = Future()
+
+    class PoolRoto:
+        def submit(self, *args, **kwargs):
+            return roto
+
+    jobs = TrainingJobManager(
+        Entrenamiento(),
+        en_segundo_plano=True,
+        executor=PoolRoto,
+        reiniciar_executor=lambda: reinicios.append(True),
+    )
+    job, _ = jobs.iniciar("completo")
+    roto.set_exception(BrokenProcessPool("un proceso del pool terminó abruptamente"))
+
+    assert jobs.obtener(job["job_id"])["estado"] == "fallido"
+    assert reinicios == [True]
+    assert jobs.iniciar("completo")[1] is True
+
+
+def test_sin_segundo_plano_entrena_dentro_de_la_llamada():
+    entrenamiento = Entrenamiento()
+    entrenamiento.liberar.set()
+
+    def sin_executor():
+        raise AssertionError("no debe usarse el pool")
+
+    jobs = TrainingJobManager(entrenamiento, en_segundo_plano=False, executor=sin_executor)
+
+    job, nuevo = jobs.iniciar("completo")
+
+    assert nuevo and job["estado"] == "completado"
+    assert jobs.obtener(job["job_id"]) == job
+
+
+def test_historial_conserva_los_ultimos_trabajos():
+    entrenamiento = Entrenamiento()
+    entrenamiento.liberar.set()
+    jobs = TrainingJobManager(entrenamiento, en_segundo_plano=False, max_historial=3)
+
+    ids = [jobs.iniciar("completo")[0]["job_id"] for _ in range(5)]
+
+    assert [jobs.obtener(job_id) is not None for job_id in ids] == [False, False, True, True, True]
+
+
+@pytest.mark.parametrize("en_segundo_plano,codigo", [(True, 202), (False, 200)])
+def test_rutas_de_entrenamiento(pool, en_segundo_plano, codigo):
+    entrenamiento = Entrenamiento()
+    if not en_segundo_plano:
+        entrenamiento.liberar.set()
+    jobs = TrainingJobManager(entrenamiento, en_segundo_plano=en_segundo_plano, executor=lambda: pool)
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_training_jobs] = lambda: jobs
+    client = TestClient(app)
+
+    response = client.post("/api/v1/ia/entrenar")
+    entrenamiento.liberar.set()
+
+    assert response.status_code == codigo
+    assert response.json()["modo"] == "completo"
+    job_id = response.json()["job_id"]
+    _esperar(jobs, job_id)
+    assert client.get(f"/api/v1/ia/entrenar/{job_id}").json()["estado"] == "completado"
+    assert client.get("/api/v1/ia/entrenar/desconocido").status_code == 404